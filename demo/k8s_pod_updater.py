@@ -1,16 +1,22 @@
-import paramiko
-import time
 import sys
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                             QHBoxLayout, QLabel, QLineEdit, QPushButton, 
-                            QTextEdit, QMessageBox, QGroupBox, QComboBox)
-from PyQt6.QtCore import QThread, pyqtSignal
+                            QTextEdit, QMessageBox, QGroupBox, QComboBox,
+                            QCheckBox, QListWidget, QListWidgetItem, QSpinBox,
+                            QTableWidget, QTableWidgetItem, QHeaderView)
+from PyQt6.QtCore import Qt, QThread, QTimer, pyqtSignal
+from k8s_updater_core import (MAX_PARALLEL_ROLLOUTS, INVENTORY_TTL, RolloutGate, ClusterInventory,
+                              K8sPodUpdater, RolloutJournal)
+
+# 批量更新进度表格的列
+ROLLOUT_COLUMNS = ["命名空间", "Deployment", "状态", "耗时", "信息"]
 
 class UpdateThread(QThread):
     """后台更新线程，用于执行镜像更新操作，避免界面卡死"""
     # 定义信号，用于向主线程发送日志和完成状态
     log_signal = pyqtSignal(str)  # 发送日志信息
     finished_signal = pyqtSignal(bool, str)  # 发送完成状态和消息
+    target_finished = pyqtSignal(object)  # 批量模式下每个 deployment 完成时发送 RolloutResult
 
     def __init__(self, config):
         super().__init__()
@@ -24,7 +30,9 @@ class UpdateThread(QThread):
                 hostname=self.config["hostname"],
                 username=self.config["username"],
                 password=self.config["password"],
-                port=self.config["port"]
+                port=self.config["port"],
+                logger=self.log_signal.emit,  # 更新器的日志通过信号转发到界面
+                journal=RolloutJournal()  # 每次 rollout 记录到本地日志，用 k8s_rollout_report.py 统计耗时
             )
             
             # 连接服务器
@@ -32,11 +40,21 @@ class UpdateThread(QThread):
                 self.finished_signal.emit(False, "连接服务器失败")
                 return
 
+            if self.config.get("targets"):
+                # 批量模式：多个 deployment 并发更新，共用同一个SSH连接
+                results = updater.update_images(self.config["targets"], self.config.get("max_workers", 4),
+                                                on_result=self.target_finished.emit, gate=self.config.get("gate"))
+                updater.close()
+                failed = sum(1 for result in results if not result.success)
+                self.finished_signal.emit(failed == 0, f"批量更新完成: {len(results) - failed} 个成功，{failed} 个失败")
+                return
+
             # 执行镜像更新
             success = updater.update_pod_image(
                 self.config["namespace"],
                 self.config["deployment_name"],
-                self.config["new_image"]
+                self.config["new_image"],
+                self.config.get("gate")
             )
             
             updater.close()
@@ -45,125 +63,34 @@ class UpdateThread(QThread):
         except Exception as e:
             self.finished_signal.emit(False, f"发生错误: {str(e)}")
 
-class K8sPodUpdater:
-    """Kubernetes Pod 更新器，负责与服务器交互和更新操作"""
-    def __init__(self, hostname, username, password=None, key_filename=None, port=22):
-        """初始化更新器
-        Args:
-            hostname: 服务器地址
-            username: SSH用户名
-            password: SSH密码
-            key_filename: SSH密钥文件路径
-            port: SSH端口
-        """
-        self.hostname = hostname
-        self.username = username
-        self.password = password
-        self.key_filename = key_filename
-        self.port = port
-        self.client = None
-
-    def connect(self):
-        """建立SSH连接"""
-        try:
-            self.client = paramiko.SSHClient()
-            self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            
-            # 根据认证方式选择连接方法
-            if self.key_filename:
-                self.client.connect(
-                    hostname=self.hostname,
-                    port=self.port,
-                    username=self.username,
-                    key_filename=self.key_filename
-                )
-            else:
-                self.client.connect(
-                    hostname=self.hostname,
-                    port=self.port,
-                    username=self.username,
-                    password=self.password
-                )
-            print(f"成功连接到服务器 {self.hostname}")
-            return True
-        except Exception as e:
-            print(f"连接失败: {str(e)}")
-            return False
+class InventoryThread(QThread):
+    """在后台加载集群清单，避免界面卡死"""
+    loaded = pyqtSignal(bool, str)  # 是否成功, 说明
 
-    def update_pod_image(self, namespace, deployment_name, new_image):
-        """更新Pod的镜像
-        Args:
-            namespace: 命名空间
-            deployment_name: deployment名称
-            new_image: 新的镜像地址
-        """
-        if not self.client:
-            print("未连接到服务器")
-            return False
+    def __init__(self, config, inventory):
+        super().__init__()
+        self.config = config
+        self.inventory = inventory
 
+    def run(self):
         try:
-            # 获取deployment中容器的名称
-            get_deployment_cmd = f"kubectl get deployment {deployment_name} -n {namespace} -o jsonpath='{{.spec.template.spec.containers[0].name}}'"
-            stdin, stdout, stderr = self.client.exec_command(get_deployment_cmd)
-            container_name = stdout.read().decode().strip()
-            
-            if not container_name:
-                print(f"无法获取 deployment {deployment_name} 的容器名称")
-                return False
-            
-            print(f"找到容器名称: {container_name}")
-            
-            # 执行更新镜像的命令
-            command = f"kubectl set image deployment/{deployment_name} {container_name}={new_image} -n {namespace}"
-            
-            stdin, stdout, stderr = self.client.exec_command(command)
-            
-            output = stdout.read().decode()
-            error = stderr.read().decode()
-            
-            if error:
-                print(f"执行出错: {error}")
-                return False
-            
-            print(f"命令执行成功: {output}")
-            
-            # 等待更新完成
-            self._wait_for_deployment_rollout(namespace, deployment_name)
-            
-            return True
+            updater = K8sPodUpdater(
+                hostname=self.config["hostname"],
+                username=self.config["username"],
+                password=self.config["password"],
+                port=self.config["port"],
+                logger=lambda message: None  # 后台刷新不输出连接日志
+            )
+            if not updater.connect():
+                self.loaded.emit(False, "连接服务器失败")
+                return
+            try:
+                success, message = self.inventory.refresh(updater)
+            finally:
+                updater.close()
+            self.loaded.emit(success, message)
         except Exception as e:
-            print(f"更新失败: {str(e)}")
-            return False
-
-    def _wait_for_deployment_rollout(self, namespace, deployment_name, timeout=300):
-        """等待deployment更新完成
-        Args:
-            namespace: 命名空间
-            deployment_name: deployment名称
-            timeout: 超时时间（秒）
-        """
-        print(f"等待 deployment {deployment_name} 更新完成...")
-        start_time = time.time()
-        
-        while time.time() - start_time < timeout:
-            command = f"kubectl rollout status deployment/{deployment_name} -n {namespace}"
-            stdin, stdout, stderr = self.client.exec_command(command)
-            output = stdout.read().decode()
-            
-            if "successfully rolled out" in output:
-                print(f"Deployment {deployment_name} 更新成功")
-                return True
-            
-            time.sleep(5)
-        
-        print(f"Deployment {deployment_name} 更新超时")
-        return False
-
-    def close(self):
-        """关闭SSH连接"""
-        if self.client:
-            self.client.close()
-            print("已关闭连接")
+            self.loaded.emit(False, f"获取集群清单失败: {str(e)}")
 
 class K8sPodUpdaterGUI(QMainWindow):
     """主窗口类，负责界面显示和用户交互"""
@@ -171,6 +98,10 @@ class K8sPodUpdaterGUI(QMainWindow):
         super().__init__()
         self.setWindowTitle("K8s Pod 镜像更新工具")
         self.setMinimumSize(800, 600)
+        self.update_thread = None
+        self.rollout_rows = {}  # 批量更新进度表格中 {(命名空间, deployment): 行号}
+        self.inventories = {}  # 各集群的清单缓存 {(主机, 端口, 用户名): ClusterInventory}
+        self.inventory_thread = None
         
         # 预设服务器信息
         self.preset_servers = {
@@ -219,6 +150,11 @@ class K8sPodUpdaterGUI(QMainWindow):
         # 创建状态栏
         self.statusBar().showMessage("就绪")
 
+        # 定期在后台刷新过期的集群清单，下拉框始终从缓存填充
+        self.inventory_timer = QTimer(self)
+        self.inventory_timer.timeout.connect(lambda: self._start_inventory_load(force=False))
+        self.inventory_timer.start(INVENTORY_TTL * 1000)
+
     def _create_server_inputs(self, layout):
         """创建服务器连接信息输入框"""
         # 服务器选择
@@ -270,6 +206,7 @@ class K8sPodUpdaterGUI(QMainWindow):
         self.namespace_combo = QComboBox()
         print(f"Created namespace_combo type: {type(self.namespace_combo)}")  # 添加调试信息
         
+        self.namespace_combo.currentTextChanged.connect(self.on_namespace_changed)
         namespace_layout.addWidget(self.namespace_combo)
         refresh_ns_btn = QPushButton("刷新命名空间")
         refresh_ns_btn.clicked.connect(self.refresh_namespaces)
@@ -290,9 +227,63 @@ class K8sPodUpdaterGUI(QMainWindow):
         image_layout = QHBoxLayout()
         image_layout.addWidget(QLabel("新镜像地址:"))
         self.new_image = QLineEdit()
+        self.new_image.setPlaceholderText("完整镜像地址，或 :标签（只替换标签）；多容器: 容器名称=镜像, 容器名称=镜像")
         image_layout.addWidget(self.new_image)
         layout.addLayout(image_layout)
 
+        # 发布策略：金丝雀门控和失败自动回滚
+        gate_layout = QHBoxLayout()
+        self.canary_checkbox = QCheckBox("金丝雀: 首批新Pod就绪后暂停并观察")
+        gate_layout.addWidget(self.canary_checkbox)
+        gate_layout.addWidget(QLabel("观察(秒):"))
+        self.canary_window_spin = QSpinBox()
+        self.canary_window_spin.setRange(10, 3600)
+        self.canary_window_spin.setValue(60)
+        gate_layout.addWidget(self.canary_window_spin)
+        gate_layout.addWidget(QLabel("允许重启次数:"))
+        self.max_restarts_spin = QSpinBox()
+        self.max_restarts_spin.setRange(0, 100)
+        gate_layout.addWidget(self.max_restarts_spin)
+        self.prepull_checkbox = QCheckBox("预拉取镜像")
+        self.prepull_checkbox.setToolTip("先在运行该Deployment的节点上并行拉取新镜像，再修改Deployment")
+        gate_layout.addWidget(self.prepull_checkbox)
+        self.auto_rollback_checkbox = QCheckBox("失败时自动回滚")
+        self.auto_rollback_checkbox.setChecked(True)
+        gate_layout.addWidget(self.auto_rollback_checkbox)
+        layout.addLayout(gate_layout)
+
+        # 批量模式：勾选多个 deployment，可附加其他命名空间中的同名 deployment
+        self.batch_checkbox = QCheckBox("批量模式（同时更新多个Deployment）")
+        self.batch_checkbox.toggled.connect(self.on_batch_toggled)
+        layout.addWidget(self.batch_checkbox)
+
+        self.batch_widget = QWidget()
+        batch_layout = QVBoxLayout(self.batch_widget)
+        batch_layout.setContentsMargins(0, 0, 0, 0)
+        self.deployment_list = QListWidget()
+        batch_layout.addWidget(self.deployment_list)
+        batch_buttons = QHBoxLayout()
+        select_all_btn = QPushButton("全选")
+        select_all_btn.clicked.connect(lambda: self._set_all_deployments_checked(True))
+        batch_buttons.addWidget(select_all_btn)
+        select_none_btn = QPushButton("全不选")
+        select_none_btn.clicked.connect(lambda: self._set_all_deployments_checked(False))
+        batch_buttons.addWidget(select_none_btn)
+        batch_buttons.addWidget(QLabel("并发数:"))
+        self.parallel_spin = QSpinBox()
+        self.parallel_spin.setRange(1, MAX_PARALLEL_ROLLOUTS)
+        self.parallel_spin.setValue(4)
+        batch_buttons.addWidget(self.parallel_spin)
+        batch_layout.addLayout(batch_buttons)
+        extra_ns_layout = QHBoxLayout()
+        extra_ns_layout.addWidget(QLabel("同时更新的其他命名空间:"))
+        self.extra_namespaces = QLineEdit()
+        self.extra_namespaces.setPlaceholderText("可选，逗号分隔，更新这些命名空间中同名的Deployment")
+        extra_ns_layout.addWidget(self.extra_namespaces)
+        batch_layout.addLayout(extra_ns_layout)
+        self.batch_widget.setVisible(False)
+        layout.addWidget(self.batch_widget)
+
     def _create_log_area(self, layout):
         """创建日志输出区域"""
         log_group = QGroupBox("执行日志")
@@ -300,6 +291,13 @@ class K8sPodUpdaterGUI(QMainWindow):
         self.log_area = QTextEdit()
         self.log_area.setReadOnly(True)
         log_layout.addWidget(self.log_area)
+        # 批量更新时每个 deployment 一行，显示各自的状态
+        self.rollout_table = QTableWidget(0, len(ROLLOUT_COLUMNS))
+        self.rollout_table.setHorizontalHeaderLabels(ROLLOUT_COLUMNS)
+        self.rollout_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.rollout_table.horizontalHeader().setStretchLastSection(True)
+        self.rollout_table.setVisible(False)
+        log_layout.addWidget(self.rollout_table)
         log_group.setLayout(log_layout)
         layout.addWidget(log_group)
 
@@ -313,6 +311,46 @@ class K8sPodUpdaterGUI(QMainWindow):
         """添加日志到日志区域"""
         self.log_area.append(message)
 
+    def on_batch_toggled(self, checked):
+        """切换批量模式"""
+        self.batch_widget.setVisible(checked)
+        self.rollout_table.setVisible(checked)
+        self.deployment_combo.setEnabled(not checked)
+
+    def _set_all_deployments_checked(self, checked):
+        """全选或全不选批量列表中的 deployment"""
+        state = Qt.CheckState.Checked if checked else Qt.CheckState.Unchecked
+        for row in range(self.deployment_list.count()):
+            self.deployment_list.item(row).setCheckState(state)
+
+    def _checked_deployments(self):
+        """返回批量列表中勾选的 deployment 名称"""
+        return [self.deployment_list.item(row).text() for row in range(self.deployment_list.count())
+                if self.deployment_list.item(row).checkState() == Qt.CheckState.Checked]
+
+    def _set_deployment_items(self, deployments):
+        """同时刷新 deployment 下拉框和批量列表，保留原来的选中和勾选状态
+        Args:
+            deployments: DeploymentInfo 列表
+        """
+        current = self.deployment_combo.currentText()
+        checked = set(self._checked_deployments())
+        self.deployment_combo.clear()
+        self.deployment_list.clear()
+        for deployment in deployments:
+            tooltip = (f"副本: {deployment.ready_replicas}/{deployment.replicas} 就绪\n"
+                       + "\n".join(deployment.images))
+            self.deployment_combo.addItem(deployment.name)
+            self.deployment_combo.setItemData(self.deployment_combo.count() - 1, tooltip,
+                                              Qt.ItemDataRole.ToolTipRole)
+            item = QListWidgetItem(deployment.name)
+            item.setToolTip(tooltip)
+            item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+            item.setCheckState(Qt.CheckState.Checked if deployment.name in checked else Qt.CheckState.Unchecked)
+            self.deployment_list.addItem(item)
+        if current:
+            self.deployment_combo.setCurrentText(current)
+
     def on_server_selected(self, server_name):
         """当选择预设服务器时，自动填充服务器信息"""
         if server_name == "自定义服务器":
@@ -327,78 +365,102 @@ class K8sPodUpdaterGUI(QMainWindow):
             self.username.setText(server_info["username"])
             self.password.setText(server_info["password"])
 
-    def refresh_namespaces(self):
-        """获取并更新命名空间列表"""
-        try:
-            # 创建临时连接获取命名空间
-            updater = K8sPodUpdater(
-                hostname=self.hostname.text().strip(),
-                username=self.username.text().strip(),
-                password=self.password.text(),
-                port=int(self.port.text().strip() or "22")
-            )
-            
-            if not updater.connect():
-                QMessageBox.critical(self, "错误", "连接服务器失败")
-                return
+    def _connection_config(self):
+        """读取界面上的连接信息"""
+        return {
+            "hostname": self.hostname.text().strip(),
+            "port": int(self.port.text().strip() or "22"),
+            "username": self.username.text().strip(),
+            "password": self.password.text(),
+        }
 
-            # 获取所有命名空间
-            cmd = "kubectl get namespaces -o jsonpath='{.items[*].metadata.name}'"
-            stdin, stdout, stderr = updater.client.exec_command(cmd)
-            namespaces = stdout.read().decode().strip().split()
-            
-            # 过滤系统命名空间和ability开头的命名空间
-            system_namespaces = {'kube-system'}
-            filtered_namespaces = [
-                ns for ns in namespaces 
-                if ns not in system_namespaces and not ns.lower().startswith('ability')
-            ]
-            
-            # 更新命名空间下拉框
-            self.namespace_combo.clear()
-            self.namespace_combo.addItems(filtered_namespaces)
-            
-            updater.close()
-            
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"获取命名空间失败: {str(e)}")
+    def _current_inventory(self):
+        """返回当前服务器的清单缓存，没有时为None"""
+        try:
+            config = self._connection_config()
+        except ValueError:
+            return None
+        return self.inventories.get((config["hostname"], config["port"], config["username"]))
 
-    def refresh_deployments(self):
-        """获取并更新Deployment列表"""
+    def _start_inventory_load(self, force):
+        """在后台加载当前服务器的集群清单
+        Args:
+            force: 为True时忽略缓存时间立即刷新；为False时只在缓存过期时刷新
+        """
+        if self.inventory_thread and self.inventory_thread.isRunning():
+            return
         try:
-            namespace = self.namespace_combo.currentText()
-            if not namespace:
-                QMessageBox.warning(self, "警告", "请先选择命名空间")
-                return
+            config = self._connection_config()
+        except ValueError:
+            return
+        if not config["hostname"] or not config["username"]:
+            if force:
+                QMessageBox.warning(self, "警告", "请先填写服务器连接信息")
+            return
+        key = (config["hostname"], config["port"], config["username"])
+        inventory = self.inventories.setdefault(key, ClusterInventory())
+        if not force and not inventory.is_stale():
+            return
+        if not force and not inventory.loaded_at:
+            return  # 定时刷新只刷新已经加载过的集群
+        self.statusBar().showMessage(f"正在加载 {config['hostname']} 的集群清单...")
+        self.inventory_thread = InventoryThread(config, inventory)
+        self.inventory_thread.loaded.connect(self.on_inventory_loaded)
+        self.inventory_thread.start()
 
-            # 创建临时连接获取Deployment
-            updater = K8sPodUpdater(
-                hostname=self.hostname.text().strip(),
-                username=self.username.text().strip(),
-                password=self.password.text(),
-                port=int(self.port.text().strip() or "22")
-            )
-            
-            if not updater.connect():
-                QMessageBox.critical(self, "错误", "连接服务器失败")
-                return
+    def on_inventory_loaded(self, success, message):
+        """集群清单加载完成后从缓存填充下拉框"""
+        self.statusBar().showMessage(message)
+        if not success:
+            self.log(message)
+            return
+        self._fill_namespaces()
 
-            # 获取所有以java开头的deployment
-            cmd = f"kubectl get deployments -n {namespace} -o jsonpath='{{.items[*].metadata.name}}'"
-            stdin, stdout, stderr = updater.client.exec_command(cmd)
-            deployments = stdout.read().decode().strip().split()
-            
-            # 过滤出java开头的deployment
-            java_deployments = [deploy for deploy in deployments if deploy.lower().startswith('java')]
-            
-            # 更新Deployment下拉框
-            self.deployment_combo.clear()
-            self.deployment_combo.addItems(java_deployments)
-            
-            updater.close()
-            
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"获取Deployment失败: {str(e)}")
+    def _fill_namespaces(self):
+        """从缓存填充命名空间下拉框，保留当前选择"""
+        inventory = self._current_inventory()
+        if not inventory:
+            return
+        # 过滤系统命名空间和ability开头的命名空间
+        system_namespaces = {'kube-system'}
+        filtered_namespaces = [
+            ns for ns in inventory.namespaces
+            if ns not in system_namespaces and not ns.lower().startswith('ability')
+        ]
+        current = self.namespace_combo.currentText()
+        self.namespace_combo.blockSignals(True)
+        self.namespace_combo.clear()
+        self.namespace_combo.addItems(filtered_namespaces)
+        if current in filtered_namespaces:
+            self.namespace_combo.setCurrentText(current)
+        self.namespace_combo.blockSignals(False)
+        self._fill_deployments()
+
+    def _fill_deployments(self):
+        """从缓存填充当前命名空间的 Deployment 列表（只显示java开头的）"""
+        inventory = self._current_inventory()
+        namespace = self.namespace_combo.currentText()
+        if not inventory or not namespace:
+            self._set_deployment_items([])
+            return
+        self._set_deployment_items([deployment for deployment in inventory.deployments_in(namespace)
+                                    if deployment.name.lower().startswith('java')])
+
+    def on_namespace_changed(self, namespace):
+        """切换命名空间时直接从缓存填充，不连接服务器"""
+        self._fill_deployments()
+
+    def refresh_namespaces(self):
+        """在后台重新加载命名空间和 Deployment 清单"""
+        self._start_inventory_load(force=True)
+
+    def refresh_deployments(self):
+        """在后台重新加载清单；已有缓存时先用缓存填充"""
+        if not self.namespace_combo.currentText():
+            QMessageBox.warning(self, "警告", "请先选择命名空间")
+            return
+        self._fill_deployments()
+        self._start_inventory_load(force=True)
 
     def update_image(self):
         """更新镜像的主函数"""
@@ -410,34 +472,86 @@ class K8sPodUpdaterGUI(QMainWindow):
             "password": self.password.text(),
             "namespace": self.namespace_combo.currentText(),
             "deployment_name": self.deployment_combo.currentText(),
-            "new_image": self.new_image.text().strip()
+            "new_image": self.new_image.text().strip(),
+            "gate": RolloutGate(
+                prepull=self.prepull_checkbox.isChecked(),
+                canary=self.canary_checkbox.isChecked(),
+                canary_window=self.canary_window_spin.value(),
+                max_restarts=self.max_restarts_spin.value(),
+                auto_rollback=self.auto_rollback_checkbox.isChecked()
+            )
         }
         
+        if self.batch_checkbox.isChecked():
+            # 批量模式：勾选的 deployment × (当前命名空间 + 其他命名空间)
+            namespaces = [config["namespace"]] + [ns.strip() for ns in self.extra_namespaces.text().split(",")
+                                                  if ns.strip() and ns.strip() != config["namespace"]]
+            config["targets"] = [(namespace, deployment, config["new_image"])
+                                 for namespace in namespaces for deployment in self._checked_deployments()]
+            config["max_workers"] = self.parallel_spin.value()
+            config["deployment_name"] = config["targets"][0][1] if config["targets"] else ""
+
         # 验证输入
         if not all([config["hostname"], config["username"], config["password"], 
                    config["namespace"], config["deployment_name"], config["new_image"]]):
-            QMessageBox.critical(self, "错误", "请填写所有必填字段")
+            QMessageBox.critical(self, "错误", "请填写所有必填字段" +
+                                 ("，并至少勾选一个Deployment" if self.batch_checkbox.isChecked() else ""))
             return
         
         # 禁用更新按钮
         self.update_button.setEnabled(False)
         self.statusBar().showMessage("正在更新...")
+
+        self.rollout_rows = {}
+        self.rollout_table.setRowCount(0)
+        for namespace, deployment, _ in config.get("targets", []):
+            row = self.rollout_table.rowCount()
+            self.rollout_table.insertRow(row)
+            for column, text in enumerate([namespace, deployment, "更新中", "", ""]):
+                self.rollout_table.setItem(row, column, QTableWidgetItem(text))
+            self.rollout_rows[(namespace, deployment)] = row
         
         # 创建并启动更新线程
         self.update_thread = UpdateThread(config)
         self.update_thread.log_signal.connect(self.log)
+        self.update_thread.target_finished.connect(self.on_target_finished)
         self.update_thread.finished_signal.connect(self.update_finished)
         self.update_thread.start()
 
+    def on_target_finished(self, result):
+        """批量模式下单个 deployment 完成时更新进度表格"""
+        row = self.rollout_rows.get((result.namespace, result.deployment))
+        if row is None:
+            return
+        self.rollout_table.setItem(row, 2, QTableWidgetItem("成功" if result.success else "失败"))
+        self.rollout_table.setItem(row, 3, QTableWidgetItem(f"{result.duration:.0f}秒"))
+        item = QTableWidgetItem(result.message)
+        item.setToolTip(f"{result.new_image}\n{result.message}")
+        self.rollout_table.setItem(row, 4, item)
+        done = sum(1 for r in range(self.rollout_table.rowCount())
+                   if self.rollout_table.item(r, 2).text() != "更新中")
+        self.statusBar().showMessage(f"正在批量更新... {done}/{self.rollout_table.rowCount()}")
+
     def update_finished(self, success, message):
         """更新完成后的处理"""
         self.update_button.setEnabled(True)
         self.statusBar().showMessage(message)
+        # 镜像已变化，在后台刷新已加载的清单缓存
+        inventory = self._current_inventory()
+        if inventory and inventory.loaded_at:
+            self._start_inventory_load(force=True)
         if success:
-            QMessageBox.information(self, "成功", "镜像更新成功")
+            QMessageBox.information(self, "成功", message if self.batch_checkbox.isChecked() else "镜像更新成功")
         else:
             QMessageBox.critical(self, "错误", message)
 
+    def closeEvent(self, event):
+        """窗口关闭时等待后台线程结束"""
+        self.inventory_timer.stop()
+        if self.inventory_thread and self.inventory_thread.isRunning():
+            self.inventory_thread.wait(5000)
+        super().closeEvent(event)
+
 def main():
     """程序入口函数"""
     app = QApplication(sys.argv)
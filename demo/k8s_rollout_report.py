@@ -0,0 +1,72 @@
+"""按 deployment 统计 rollout 日志中的耗时分布，找出启动慢的服务。
+
+rollout 日志由图形界面 (k8s_pod_updater.py) 和发布计划执行器 (k8s_updater_cli.py) 在每次 rollout 后追加写入：
+
+    # 最近7天各 deployment 的 rollout 次数与 p50/p95 耗时
+    python k8s_rollout_report.py --days 7
+
+    # 只看 prod 命名空间中名称包含 java 的 deployment，输出 JSON
+    python k8s_rollout_report.py --namespace prod --deployment java --format json
+"""
+import argparse
+import json
+import sys
+import time
+
+from k8s_updater_core import DEFAULT_JOURNAL_PATH, RolloutJournal, summarize_rollouts
+
+# 表格的列：(标题, summarize_rollouts 返回的字段)
+REPORT_COLUMNS = [
+    ("次数", "count"), ("成功", "succeeded"),
+    ("总耗时p50", "duration_p50"), ("总耗时p95", "duration_p95"),
+    ("首Pod可用p50", "first_ready_p50"), ("首Pod可用p95", "first_ready_p95"),
+    ("全部就绪p50", "all_ready_p50"), ("全部就绪p95", "all_ready_p95"),
+]
+
+
+def parse_args(argv=None):
+    """解析命令行参数。"""
+    parser = argparse.ArgumentParser(description="统计 rollout 日志中各 deployment 的耗时")
+    parser.add_argument("--journal", default=DEFAULT_JOURNAL_PATH, help=f"rollout 日志文件，默认 {DEFAULT_JOURNAL_PATH}")
+    parser.add_argument("--days", type=float, default=0, help="只统计最近N天的 rollout，0表示全部，默认0")
+    parser.add_argument("--namespace", help="只统计该命名空间")
+    parser.add_argument("--deployment", help="只统计名称包含该字符串的 deployment")
+    parser.add_argument("--format", choices=["text", "json"], default="text", help="输出格式：文本表格或 JSON")
+    return parser.parse_args(argv)
+
+
+def _format_seconds(value):
+    return "-" if value is None else f"{value:.0f}s"
+
+
+def format_report(summary):
+    """把汇总结果格式化为文本表格。首Pod可用、全部就绪从修改 deployment 时开始计算。"""
+    names = [f"{row['namespace']}/{row['deployment']}" for row in summary]
+    width = max([len("Deployment")] + [len(name) for name in names])
+    lines = ["  ".join(["Deployment".ljust(width)] + [title.rjust(10) for title, _ in REPORT_COLUMNS])]
+    for name, row in zip(names, summary):
+        cells = [str(row[key]) if key in ("count", "succeeded") else _format_seconds(row[key])
+                 for _, key in REPORT_COLUMNS]
+        lines.append("  ".join([name.ljust(width)] + [cell.rjust(10) for cell in cells]))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    """程序入口。"""
+    args = parse_args(argv)
+    since = time.time() - args.days * 86400 if args.days > 0 else None
+    records = [record for record in RolloutJournal(args.journal).records(since)
+               if (not args.namespace or record.get("namespace") == args.namespace)
+               and (not args.deployment or args.deployment in record.get("deployment", ""))]
+    summary = summarize_rollouts(records)
+    if args.format == "json":
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+    elif summary:
+        print(format_report(summary))
+    else:
+        print(f"{args.journal} 中没有符合条件的 rollout 记录", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""按发布计划批量更新 Kubernetes 镜像的命令行入口。
+
+只依赖 k8s_updater_core，不导入 PyQt6，可以在流水线执行器中运行。整个计划共用一个SSH连接，
+进度以 JSON Lines 输出（每行一个事件），便于流水线解析：
+
+    # 计划格式见 k8s_updater_core.load_release_plan
+    K8S_PASSWORD=... python k8s_updater_cli.py release.yaml --output release-progress.jsonl
+"""
+import argparse
+import json
+import signal
+import sys
+import threading
+import time
+from dataclasses import asdict
+
+from k8s_updater_core import DEFAULT_JOURNAL_PATH, K8sPodUpdater, RolloutJournal, load_release_plan
+
+
+class EventWriter:
+    """把进度事件逐行写为 JSON，可在多个 rollout 线程中同时调用"""
+    def __init__(self, out):
+        self.out = out
+        self._lock = threading.Lock()
+
+    def emit(self, event, **data):
+        record = {"event": event, "timestamp": time.time(), **data}
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            print(line, file=self.out, flush=True)
+
+
+def parse_args(argv=None):
+    """解析命令行参数。"""
+    parser = argparse.ArgumentParser(description="按发布计划批量更新 Kubernetes 镜像")
+    parser.add_argument("plan", help="发布计划文件（JSON，或安装了 PyYAML 时的 YAML）")
+    parser.add_argument("--output", help="进度事件追加写入的文件路径，默认输出到标准输出")
+    parser.add_argument("--journal", default=DEFAULT_JOURNAL_PATH,
+                        help=f"rollout 日志文件，默认 {DEFAULT_JOURNAL_PATH}")
+    parser.add_argument("--no-journal", action="store_true", help="不记录 rollout 日志")
+    parser.add_argument("--dry-run", action="store_true", help="只校验计划并输出各阶段的目标，不连接集群")
+    return parser.parse_args(argv)
+
+
+def run_plan(plan, events, stop_event, journal=None):
+    """在同一个SSH连接上按顺序执行计划的各个阶段
+    Returns:
+        bool: 所有阶段都已执行且全部成功时为True
+    """
+    updater = K8sPodUpdater(plan.hostname, plan.username, plan.password, plan.key_filename, plan.port,
+                            logger=lambda message: events.emit("log", message=message), journal=journal)
+    if not updater.connect():
+        events.emit("plan_end", success=False, message="连接服务器失败")
+        return False
+    def emit_result(result):
+        events.emit("result", outcome=result.outcome, **asdict(result))
+
+    started = time.time()
+    succeeded = failed = 0
+    skipped = []
+    try:
+        for index, stage in enumerate(plan.stages):
+            if stop_event.is_set() or (failed and not plan.continue_on_failure):
+                skipped = [item.name for item in plan.stages[index:]]
+                break
+            events.emit("stage_start", stage=stage.name, namespace=stage.namespace,
+                        deployments=[name for name, image in stage.deployments], parallelism=stage.parallelism)
+            results = updater.update_images(stage.targets(), stage.parallelism, gate=plan.gate, on_result=emit_result)
+            stage_failed = sum(1 for result in results if not result.success)
+            succeeded += len(results) - stage_failed
+            failed += stage_failed
+            events.emit("stage_end", stage=stage.name, succeeded=len(results) - stage_failed, failed=stage_failed)
+    finally:
+        updater.close()
+    success = not failed and not skipped
+    events.emit("plan_end", success=success, succeeded=succeeded, failed=failed, skipped_stages=skipped,
+                duration=time.time() - started)
+    return success
+
+
+def main(argv=None):
+    """程序入口。返回值为进程退出码：全部成功为0，有失败或未执行的阶段为1，计划无效为2。"""
+    args = parse_args(argv)
+    try:
+        plan = load_release_plan(args.plan)
+    except (OSError, ValueError) as e:
+        print(f"无法加载发布计划: {str(e)}", file=sys.stderr)
+        return 2
+
+    out = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+    events = EventWriter(out)
+    try:
+        events.emit("plan_start", plan=args.plan, cluster=f"{plan.hostname}:{plan.port}", gate=asdict(plan.gate),
+                    stages=[{"stage": stage.name, "namespace": stage.namespace,
+                             "deployments": dict(stage.deployments), "parallelism": stage.parallelism}
+                            for stage in plan.stages])
+        if args.dry_run:
+            return 0
+        # SIGTERM 时等待当前阶段的 rollout 结束，不再开始后续阶段
+        stop_event = threading.Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+        journal = None if args.no_journal else RolloutJournal(args.journal)
+        return 0 if run_plan(plan, events, stop_event, journal) else 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1091 @@
+"""Kubernetes 镜像更新的核心逻辑：SSH执行 kubectl、镜像修改解析、rollout 等待、金丝雀门控与回滚、镜像预拉取、集群清单。
+
+本模块不依赖 PyQt6，图形界面 (k8s_pod_updater.py) 与发布计划执行器 (k8s_updater_cli.py) 共用。
+"""
+import codecs
+import json
+import os
+import shlex
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field, fields
+
+import paramiko
+
+# 批量更新时同时进行的 rollout 上限。所有 rollout 共用一个SSH连接上的多个通道，
+# 每个 rollout 最多同时占用两个（watch 和停滞时的Pod检查），sshd 默认 MaxSessions 为10
+MAX_PARALLEL_ROLLOUTS = 5
+
+# rollout 进度停滞多少秒后检查新Pod是否处于无法恢复的等待状态
+ROLLOUT_STALL_CHECK_INTERVAL = 20
+# 出现这些容器等待原因时判定 rollout 失败，不再等到超时
+ROLLOUT_FATAL_REASONS = frozenset({"ErrImagePull", "ImagePullBackOff", "InvalidImageName", "CrashLoopBackOff",
+                                   "CreateContainerConfigError", "CreateContainerError"})
+
+# 集群清单（命名空间与 deployment）的缓存时间（秒）
+INVENTORY_TTL = 60
+# 一次远程调用取回集群清单：第一行为所有命名空间，其后每个 deployment 一行；退出码为最后执行的 kubectl 的退出码
+# 命名空间\t名称\t期望副本数\t就绪副本数\t容器镜像(空格分隔)
+INVENTORY_COMMAND = ("kubectl get namespaces -o jsonpath='{.items[*].metadata.name}' && echo && "
+                     "kubectl get deployments -A -o jsonpath='{range .items[*]}{.metadata.namespace}{\"\\t\"}"
+                     "{.metadata.name}{\"\\t\"}{.spec.replicas}{\"\\t\"}{.status.readyReplicas}{\"\\t\"}"
+                     "{.spec.template.spec.containers[*].image}{\"\\n\"}{end}'")
+
+# 金丝雀观察期间检查新Pod状态的间隔（秒）
+CANARY_CHECK_INTERVAL = 5
+# 修改 deployment 后等待控制器创建首批新Pod的最长时间（秒），之后才暂停 rollout
+CANARY_START_TIMEOUT = 60
+# deployment 当前版本号所在的注解
+REVISION_ANNOTATION = "deployment.kubernetes.io/revision"
+
+# rollout 日志的默认位置
+DEFAULT_JOURNAL_PATH = os.path.join(os.path.expanduser("~"), ".k8s_pod_updater", "rollouts.jsonl")
+
+# 镜像预拉取：检查进度的间隔（秒）、预拉取Pod的标签，以及判断拉取状态的容器等待原因
+PREPULL_CHECK_INTERVAL = 3
+PREPULL_LABEL = "k8s-pod-updater/prepull"
+PREPULL_PENDING_REASONS = frozenset({"ContainerCreating", "PodInitializing"})
+PREPULL_FAILED_REASONS = frozenset({"ErrImagePull", "ImagePullBackOff", "InvalidImageName"})
+# 预拉取容器只执行 exit 0；显式声明资源，避免在要求声明 requests/limits 的 ResourceQuota 下无法创建Pod
+PREPULL_RESOURCES = {"requests": {"cpu": "10m", "memory": "16Mi"}, "limits": {"cpu": "10m", "memory": "16Mi"}}
+# Job 创建后超过该时间（秒）仍有节点没有预拉取Pod，视为Pod无法创建
+PREPULL_CREATE_GRACE = 30
+PREPULL_EVENTS_MARKER = "__PREPULL_EVENTS__"
+
+
+@dataclass
+class RolloutResult:
+    """单个 deployment 的镜像更新结果"""
+    namespace: str
+    deployment: str
+    new_image: str
+    success: bool = False
+    message: str = ""
+    duration: float = 0.0  # 从开始更新到 rollout 结束的秒数
+    changes: list = field(default_factory=list)  # 实际修改的容器 [(容器名称, 原镜像, 新镜像)]
+    previous_revision: str = ""  # 更新前的 deployment 版本号，回滚时使用
+    rolled_back: bool = False  # 失败后是否已自动回滚到 previous_revision
+    started_at: float = 0.0  # 开始更新的Unix时间戳
+    # 各阶段完成时距开始的秒数：prepull（预拉取结束）、patch（已修改 deployment）、
+    # first_ready（首个新Pod可用）、all_ready（rollout 完成）
+    phases: dict = field(default_factory=dict)
+
+    @property
+    def outcome(self):
+        """结果分类：unchanged、success、rolled_back 或 failed"""
+        if self.success:
+            return "success" if self.changes else "unchanged"
+        return "rolled_back" if self.rolled_back else "failed"
+
+
+@dataclass
+class RolloutGate:
+    """rollout 的执行策略：镜像预拉取、金丝雀门控和失败处理"""
+    prepull: bool = False  # 为True时先在运行该 deployment 的节点上并行拉取新镜像，再修改 deployment
+    prepull_timeout: int = 600  # 预拉取的最长等待时间（秒），超时后照常 rollout
+    canary: bool = False  # 为True时首批新Pod就绪后暂停 rollout，观察一段时间再继续
+    canary_window: int = 60  # 观察时长（秒）
+    max_restarts: int = 0  # 观察期间新Pod允许的重启次数
+    auto_rollback: bool = True  # 金丝雀或 rollout 失败时自动执行 rollout undo
+
+
+@dataclass
+class DeploymentInfo:
+    """集群清单中的一个 deployment"""
+    namespace: str
+    name: str
+    replicas: int = 0
+    ready_replicas: int = 0
+    images: list = field(default_factory=list)
+
+
+class ClusterInventory:
+    """单个集群的命名空间和 deployment 缓存，过期前界面直接从缓存读取，不再连接服务器"""
+    def __init__(self, ttl=INVENTORY_TTL):
+        self.ttl = ttl
+        self.loaded_at = 0.0  # 最近一次成功加载的时间，0 表示尚未加载
+        self.namespaces = []
+        self.deployments = {}  # {命名空间: [DeploymentInfo]}
+
+    def is_stale(self):
+        """缓存是否已过期（或尚未加载）"""
+        return time.time() - self.loaded_at >= self.ttl
+
+    def deployments_in(self, namespace):
+        """返回命名空间中的 deployment 列表（按名称排序）"""
+        return self.deployments.get(namespace, [])
+
+    def refresh(self, updater):
+        """通过已连接的更新器重新加载清单，成功时整体替换缓存
+        Args:
+            updater: 已连接的 K8sPodUpdater
+        Returns:
+            tuple: (bool, str) 是否成功及说明
+        """
+        status, output, error = updater.run_command_status(INVENTORY_COMMAND)
+        lines = output.split("\n")
+        if not lines[0].strip():
+            return False, f"获取集群清单失败: {error or '没有返回命名空间'}"
+        # 命名空间已返回但列出 deployment 失败（如没有跨命名空间的 list 权限）时不能当作空清单
+        if status != 0:
+            return False, f"获取 deployment 列表失败: {error or f'退出码 {status}'}"
+        deployments = {}
+        for line in lines[1:]:
+            fields = line.split("\t")
+            if len(fields) < 5:
+                continue
+            namespace, name, replicas, ready, images = fields[:5]
+            deployments.setdefault(namespace, []).append(DeploymentInfo(
+                namespace, name, int(replicas or 0), int(ready or 0), images.split()))
+        for items in deployments.values():
+            items.sort(key=lambda deployment: deployment.name)
+        # 后台线程中加载，赋值完成前界面仍读取旧的缓存
+        self.namespaces = sorted(lines[0].split())
+        self.deployments = deployments
+        self.loaded_at = time.time()
+        return True, f"已加载 {len(self.namespaces)} 个命名空间、{sum(map(len, deployments.values()))} 个 deployment"
+
+
+def image_repository(image):
+    """去掉镜像地址的标签和摘要，例如 registry:5000/app/java-a:1.2 -> registry:5000/app/java-a"""
+    repository = image.split("@", 1)[0]
+    name_start = repository.rfind("/") + 1  # 仓库地址中的端口号不是标签
+    if ":" in repository[name_start:]:
+        repository = repository[:repository.rindex(":")]
+    return repository
+
+
+def replace_image_tag(image, tag):
+    """把镜像地址的标签（或摘要）替换为新标签，例如 registry:5000/app/java-a:1.2 -> registry:5000/app/java-a:1.3"""
+    return f"{image_repository(image)}:{tag}"
+
+
+def parse_image_updates(spec):
+    """解析镜像更新说明
+    Args:
+        spec: 单个镜像地址（或 ":标签"），或以逗号/空白分隔的 "目标=镜像" 列表，
+              目标为容器名称（含 initContainer）或镜像仓库；已是字典时原样返回
+    Returns:
+        dict: {目标: 镜像}，目标为空字符串表示自动匹配
+    """
+    if isinstance(spec, dict):
+        return dict(spec)
+    if "=" not in spec:
+        return {"": spec.strip()}
+    updates = {}
+    for item in spec.replace(",", " ").split():
+        target, _, image = item.partition("=")
+        updates[target.strip()] = image.strip()
+    return updates
+
+
+def resolve_image_updates(containers, updates):
+    """把镜像更新说明解析为具体的容器修改，任何一项无法唯一确定目标时整体失败，不会改错容器
+    Args:
+        containers: [(类型 "containers"/"initContainers", 容器名称, 当前镜像)]，按 deployment 中的顺序
+        updates: parse_image_updates 的返回值
+    Returns:
+        tuple: ([(类型, 容器名称, 原镜像, 新镜像)], 错误信息或None)，镜像未变化的容器不包含在内
+    """
+    changes = {}
+    for target, image in updates.items():
+        if not image:
+            return [], f"目标 {target or '(自动)'} 缺少镜像地址"
+        if target:
+            # 先按容器名称匹配，再按镜像仓库匹配（可能命中多个使用同一镜像的容器）
+            matched = [c for c in containers if c[1] == target] or \
+                      [c for c in containers if image_repository(c[2]) == target]
+        elif image.startswith(":"):
+            # 只给出标签且未指定容器：沿用以前的行为，更新第一个容器（主容器）
+            matched = [c for c in containers if c[0] == "containers"][:1]
+        else:
+            # 未指定容器：更新使用同一镜像仓库的容器；只有一个容器时更新它
+            matched = [c for c in containers if image_repository(c[2]) == image_repository(image)]
+            if not matched and len([c for c in containers if c[0] == "containers"]) == 1:
+                matched = [c for c in containers if c[0] == "containers"]
+            if not matched:
+                return [], (f"有多个容器（{', '.join(c[1] for c in containers)}），且没有容器使用镜像仓库 "
+                            f"{image_repository(image)}，请用 容器名称=镜像 指定")
+        if not matched:
+            return [], f"没有名称或镜像仓库为 {target} 的容器"
+        for kind, name, current in matched:
+            new = replace_image_tag(current, image[1:]) if image.startswith(":") else image
+            changes[(kind, name)] = (current, new)
+    return [(kind, name, old, new) for (kind, name), (old, new) in changes.items() if old != new], None
+
+
+@dataclass
+class ReleaseStage:
+    """发布计划中的一个阶段：阶段内的 deployment 并发更新，阶段之间按顺序执行"""
+    name: str
+    namespace: str
+    deployments: list = field(default_factory=list)  # [(deployment名称, 新镜像)]，镜像写法同 rollout_image
+    parallelism: int = 4
+
+    def targets(self):
+        """转换为 update_images 的 targets 参数"""
+        return [(self.namespace, name, image) for name, image in self.deployments]
+
+
+@dataclass
+class ReleasePlan:
+    """发布计划：目标集群、rollout 策略和按顺序执行的阶段"""
+    hostname: str
+    username: str
+    port: int = 22
+    password: str = None
+    key_filename: str = None
+    gate: RolloutGate = field(default_factory=RolloutGate)
+    stages: list = field(default_factory=list)
+    continue_on_failure: bool = False  # 为False时某个阶段有失败就不再执行后续阶段
+
+
+def _plan_int(value, name):
+    """把发布计划中的数值项转换为 int，类型不对时抛出 ValueError"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} 必须是整数: {value!r}")
+
+
+def _valid_plan_image(image):
+    """镜像写法为非空字符串，或非空的 {容器名: 镜像字符串}"""
+    if isinstance(image, dict):
+        return bool(image) and all(isinstance(value, str) and value for value in image.values())
+    return isinstance(image, str) and bool(image)
+
+
+def load_release_plan(path):
+    """读取 JSON 或 YAML 格式的发布计划
+    计划文件示例（YAML 需要安装 PyYAML）：
+        cluster: {hostname: 192.168.2.36, port: 3622, username: root, password_env: K8S_PASSWORD}
+        parallelism: 4                  # 各阶段默认的并发数
+        gate: {prepull: true, canary: false, auto_rollback: true}
+        stages:                         # 按顺序执行；只有一个阶段时可省略 stages，直接写 namespace/deployments
+          - name: base
+            namespace: prod
+            deployments: {java-gateway: ":v2.3.0"}
+          - namespace: prod
+            parallelism: 8
+            deployments: {java-order: ":v2.3.0", java-user: {app: "repo/user:v2.3.0", sidecar: ":1.2"}}
+    密码不写在计划文件中，而是从 password_env 指定的环境变量读取
+    Args:
+        path: 计划文件路径，.yaml/.yml 按 YAML 解析，其他按 JSON 解析
+    Returns:
+        ReleasePlan: 解析后的发布计划
+    Raises:
+        ValueError: 文件格式或内容不正确
+    """
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if path.lower().endswith((".yaml", ".yml")):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError("读取 YAML 发布计划需要安装 PyYAML，或改用 JSON 格式")
+        data = yaml.safe_load(text)
+    else:
+        data = json.loads(text)
+    if not isinstance(data, dict):
+        raise ValueError("发布计划必须是一个对象")
+
+    cluster = data.get("cluster") or {}
+    if not isinstance(cluster, dict) or not cluster.get("hostname") or not cluster.get("username"):
+        raise ValueError("cluster 必须是一个对象，并提供 hostname 和 username")
+    gate = data.get("gate") or {}
+    if not isinstance(gate, dict):
+        raise ValueError("gate 必须是一个对象")
+    gate_fields = {item.name: item.type for item in fields(RolloutGate)}
+    unknown = set(gate) - set(gate_fields)
+    if unknown:
+        raise ValueError(f"gate 中有未知的选项: {', '.join(sorted(unknown))}")
+    # 字符串 "false" 会被当作真值、"60" 无法与数字比较，在修改集群之前就校验类型
+    gate = dict(gate)
+    for name, value in gate.items():
+        if gate_fields[name] is bool:
+            if not isinstance(value, bool):
+                raise ValueError(f"gate.{name} 必须是 true 或 false: {value!r}")
+        else:
+            gate[name] = _plan_int(value, f"gate.{name}")
+            if gate[name] < 0:
+                raise ValueError(f"gate.{name} 不能为负数: {value!r}")
+    parallelism = _plan_int(data.get("parallelism", 4), "parallelism")
+    raw_stages = data.get("stages") or [data]
+    if not isinstance(raw_stages, list):
+        raise ValueError("stages 必须是一个列表")
+    stages = []
+    for index, stage in enumerate(raw_stages):
+        if not isinstance(stage, dict):
+            raise ValueError(f"第 {index + 1} 个阶段必须是一个对象")
+        namespace = stage.get("namespace") or data.get("namespace")
+        deployments = stage.get("deployments") or {}
+        if not namespace or not isinstance(deployments, dict) or not deployments:
+            raise ValueError(f"第 {index + 1} 个阶段必须提供 namespace 和 deployments（deployment名称 -> 镜像）")
+        for name, image in deployments.items():
+            if not _valid_plan_image(image):
+                raise ValueError(f"第 {index + 1} 个阶段中 {name} 的镜像必须是字符串，或 容器名 -> 镜像 的对象")
+        stages.append(ReleaseStage(str(stage.get("name") or f"stage-{index + 1}"), str(namespace),
+                                   [(str(name), image) for name, image in deployments.items()],
+                                   _plan_int(stage.get("parallelism", parallelism), f"第 {index + 1} 个阶段的 parallelism")))
+    return ReleasePlan(
+        hostname=cluster["hostname"],
+        username=cluster["username"],
+        port=_plan_int(cluster.get("port") or 22, "cluster.port"),
+        password=os.environ.get(cluster.get("password_env", "K8S_PASSWORD")),
+        key_filename=cluster.get("key_file"),
+        gate=RolloutGate(**gate),
+        stages=stages,
+        continue_on_failure=bool(data.get("continue_on_failure", False)),
+    )
+
+
+class RolloutJournal:
+    """只追加的本地 rollout 日志，每次 rollout 一行 JSON，供 k8s_rollout_report.py 统计耗时"""
+    def __init__(self, path=DEFAULT_JOURNAL_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(self, result, cluster=""):
+        """追加一条 rollout 记录
+        Args:
+            result: RolloutResult
+            cluster: 集群标识（SSH 主机:端口）
+        """
+        record = {
+            "cluster": cluster,
+            "namespace": result.namespace,
+            "deployment": result.deployment,
+            "changes": [{"container": name, "old": old, "new": new} for name, old, new in result.changes],
+            "started_at": result.started_at,
+            "finished_at": result.started_at + result.duration,
+            "duration": round(result.duration, 3),
+            "phases": result.phases,
+            "outcome": result.outcome,
+            "message": result.message,
+            "previous_revision": result.previous_revision,
+        }
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # 每条记录一次 append 写入，多个进程同时写同一个文件也不会交错
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    def records(self, since=None):
+        """读取全部记录，跳过损坏的行
+        Args:
+            since: 只返回此Unix时间戳之后开始的记录
+        Returns:
+            list: 记录字典列表，按写入顺序
+        """
+        records = []
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if since is None or record.get("started_at", 0) >= since:
+                        records.append(record)
+        except FileNotFoundError:
+            pass
+        return records
+
+
+def percentile(values, q):
+    """线性插值的百分位数
+    Args:
+        values: 数值列表
+        q: 0~100
+    Returns:
+        float: 百分位数，列表为空时为None
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    position = (len(values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def summarize_rollouts(records):
+    """按 deployment 汇总 rollout 次数和耗时分布（镜像未变化的记录不计入）
+    Returns:
+        list: 每个 deployment 一个字典，按总耗时 p95 从高到低排序；
+              首Pod可用、全部就绪的耗时从修改 deployment 时开始计算，反映新Pod的启动速度
+    """
+    groups = {}
+    for record in records:
+        if record.get("outcome") == "unchanged":
+            continue
+        groups.setdefault((record.get("namespace", ""), record.get("deployment", "")), []).append(record)
+    summary = []
+    for (namespace, deployment), items in groups.items():
+        succeeded = [item for item in items if item.get("outcome") == "success"]
+        phase_spans = {"first_ready": [], "all_ready": []}
+        for item in succeeded:
+            phases = item.get("phases", {})
+            for name, values in phase_spans.items():
+                if name in phases and "patch" in phases:
+                    values.append(phases[name] - phases["patch"])
+        durations = [item["duration"] for item in succeeded]
+        row = {"namespace": namespace, "deployment": deployment, "count": len(items), "succeeded": len(succeeded),
+               "duration_p50": percentile(durations, 50), "duration_p95": percentile(durations, 95)}
+        for name, values in phase_spans.items():
+            row[f"{name}_p50"] = percentile(values, 50)
+            row[f"{name}_p95"] = percentile(values, 95)
+        summary.append(row)
+    summary.sort(key=lambda row: -(row["duration_p95"] or 0))
+    return summary
+
+
+class K8sPodUpdater:
+    """Kubernetes Pod 更新器，负责与服务器交互和更新操作"""
+    def __init__(self, hostname, username, password=None, key_filename=None, port=22, logger=None, journal=None):
+        """初始化更新器
+        Args:
+            hostname: 服务器地址
+            username: SSH用户名
+            password: SSH密码
+            key_filename: SSH密钥文件路径
+            port: SSH端口
+            logger: 接收日志文本的函数，默认为 print；批量更新时会在多个线程中调用
+            journal: RolloutJournal，为None时不记录 rollout 日志
+        """
+        self.hostname = hostname
+        self.username = username
+        self.password = password
+        self.key_filename = key_filename
+        self.port = port
+        self.client = None
+        self.logger = logger or print
+        self.journal = journal
+
+    def _log(self, message):
+        """输出一条日志"""
+        self.logger(message)
+
+    def run_command(self, command):
+        """执行远程命令并读取全部输出
+        Returns:
+            tuple: (str, str) 标准输出和标准错误（均已去掉首尾空白）
+        """
+        status, output, error = self.run_command_status(command)
+        return output, error
+
+    def run_command_status(self, command):
+        """执行远程命令，读取全部输出和退出码
+        kubectl 成功时也可能向 stderr 输出警告（如 PodSecurity、弃用提示），需要以退出码判断成败
+        Returns:
+            tuple: (int, str, str) 退出码、标准输出和标准错误（均已去掉首尾空白）
+        """
+        stdin, stdout, stderr = self.client.exec_command(command)
+        output, error = stdout.read().decode().strip(), stderr.read().decode().strip()
+        return stdout.channel.recv_exit_status(), output, error
+
+    def connect(self):
+        """建立SSH连接"""
+        try:
+            self.client = paramiko.SSHClient()
+            self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            
+            # 根据认证方式选择连接方法
+            if self.key_filename:
+                self.client.connect(
+                    hostname=self.hostname,
+                    port=self.port,
+                    username=self.username,
+                    key_filename=self.key_filename
+                )
+            else:
+                self.client.connect(
+                    hostname=self.hostname,
+                    port=self.port,
+                    username=self.username,
+                    password=self.password
+                )
+            self._log(f"成功连接到服务器 {self.hostname}")
+            return True
+        except Exception as e:
+            self._log(f"连接失败: {str(e)}")
+            return False
+
+    def update_pod_image(self, namespace, deployment_name, new_image, gate=None):
+        """更新Pod的镜像
+        Args:
+            namespace: 命名空间
+            deployment_name: deployment名称
+            new_image: 新的镜像地址
+            gate: RolloutGate，金丝雀门控和自动回滚策略，默认不启用
+        Returns:
+            bool: 镜像已更新且 rollout 在超时前完成时为True
+        """
+        return self.rollout_image(namespace, deployment_name, new_image, gate).success
+
+    def rollout_image(self, namespace, deployment_name, new_image, gate=None):
+        """更新单个 deployment 的镜像并等待 rollout 完成，返回结构化结果
+        Args:
+            namespace: 命名空间
+            deployment_name: deployment名称
+            new_image: 新的镜像地址，以 ":" 开头时视为只替换标签，保留原镜像仓库；
+                       也可以是 "容器名称或镜像仓库=镜像" 列表或字典，见 parse_image_updates
+            gate: RolloutGate，金丝雀门控和自动回滚策略；为None时直接 rollout，失败不回滚
+        Returns:
+            RolloutResult: 更新结果
+        """
+        result = RolloutResult(namespace, deployment_name, new_image if isinstance(new_image, str) else
+                               ", ".join(f"{target}={image}" for target, image in new_image.items()))
+        if not self.client:
+            result.message = "未连接到服务器"
+            self._log(result.message)
+            return result
+
+        start_time = result.started_at = time.time()
+        marks = {}  # 阶段名 -> 完成时的时间戳
+        try:
+            # 一次取回完整的 deployment，得到所有容器和 initContainer 的名称与当前镜像
+            stdin, stdout, stderr = self.client.exec_command(
+                f"kubectl get {self._target(namespace, deployment_name)} -o json")
+            output = stdout.read().decode()
+            error = stderr.read().decode().strip()
+            if error or not output.strip():
+                result.message = f"无法获取 deployment {deployment_name}: {error}"
+                self._log(result.message)
+                return result
+            deployment = json.loads(output)
+            result.previous_revision = deployment["metadata"].get("annotations", {}).get(REVISION_ANNOTATION, "")
+            pod_spec = deployment["spec"]["template"]["spec"]
+            containers = [(kind, c["name"], c.get("image", ""))
+                          for kind in ("containers", "initContainers") for c in pod_spec.get(kind, [])]
+
+            changes, error = resolve_image_updates(containers, parse_image_updates(new_image))
+            if error:
+                result.message = error
+                self._log(f"[{namespace}/{deployment_name}] {result.message}")
+                return result
+            result.changes = [(name, old, new) for kind, name, old, new in changes]
+            result.new_image = ", ".join(f"{name}={new}" for name, old, new in result.changes) or result.new_image
+            if not changes:
+                result.success, result.message = True, "镜像未变化，无需更新"
+                self._log(f"[{namespace}/{deployment_name}] {result.message}")
+                return result
+            for kind, name, old, new in changes:
+                self._log(f"[{namespace}/{deployment_name}] {name}: {old} -> {new}")
+
+            if gate and gate.prepull:
+                success, message = self._prepull_images(namespace, deployment_name, deployment,
+                                                        result.changes, gate.prepull_timeout)
+                marks["prepull"] = time.time()
+                if not success:
+                    result.message = message
+                    self._log(f"[{namespace}/{deployment_name}] {message}")
+                    return result
+
+            command = (f"kubectl patch {self._target(namespace, deployment_name)} --type strategic "
+                       f"-p {shlex.quote(self._image_patch(changes))}")
+            # 以退出码判断成败，stderr 中可能只是警告
+            status, output, error = self.run_command_status(command)
+            if status != 0:
+                result.message = f"执行出错: {error or output}"
+                self._log(f"[{namespace}/{deployment_name}] {result.message}")
+                return result
+
+            marks["patch"] = time.time()
+            self._log(f"[{namespace}/{deployment_name}] 命令执行成功: {output}")
+            if error:
+                self._log(f"[{namespace}/{deployment_name}] kubectl 提示: {error}")
+
+            success, message = True, ""
+            rollback_attempted = False
+            canary = bool(gate and gate.canary)
+            if canary:
+                # 等控制器创建出首批新Pod后再暂停：过早暂停时新 ReplicaSet 不会扩容，门控只能等到超时
+                success, message = self._wait_for_new_pods(namespace, deployment_name)
+                if not success:
+                    canary = False
+                    self._log(f"[{namespace}/{deployment_name}] {message}")
+                    if gate.auto_rollback and result.previous_revision:
+                        rollback_attempted = True
+                        result.rolled_back = self._rollback(namespace, deployment_name, result.previous_revision)
+                else:
+                    status, output, error = self.run_command_status(
+                        f"kubectl rollout pause {self._target(namespace, deployment_name)}")
+                    if status != 0:
+                        self._log(f"[{namespace}/{deployment_name}] 暂停 rollout 失败（{error}），跳过金丝雀检查")
+                        canary = False
+            if canary:
+                passed = None  # 门控抛出异常时保持为None
+                try:
+                    success, message = self._canary_gate(namespace, deployment_name, self._label_selector(deployment),
+                                                         result.changes, gate, marks)
+                    passed = success
+                    if not success:
+                        self._log(f"[{namespace}/{deployment_name}] {message}")
+                finally:
+                    # pause 已执行：无论门控结果如何（包括异常）都要恢复或回滚，不能让 deployment 意外停在暂停状态
+                    if passed:
+                        self.run_command(f"kubectl rollout resume {self._target(namespace, deployment_name)}")
+                    elif gate.auto_rollback:
+                        rollback_attempted = True
+                        # 在暂停状态下把镜像改回原值再恢复，新 ReplicaSet 不会在回滚生效前继续扩容
+                        result.rolled_back = self._rollback(namespace, deployment_name, result.previous_revision,
+                                                            restore=changes)
+                    elif passed is None:
+                        # 门控本身出错、尚未判定失败：按未启用门控的方式继续 rollout
+                        self.run_command(f"kubectl rollout resume {self._target(namespace, deployment_name)}")
+                    # 判定失败且未启用自动回滚：保持暂停，等待人工处理
+                if passed is False and not gate.auto_rollback:
+                    message += "；rollout 保持暂停，请检查后手动恢复或回滚"
+            if success:
+                # 等待更新完成
+                success, message = self._wait_for_deployment_rollout(namespace, deployment_name, marks=marks)
+                if not success and gate and gate.auto_rollback and result.previous_revision:
+                    rollback_attempted = True
+                    result.rolled_back = self._rollback(namespace, deployment_name, result.previous_revision)
+            result.success, result.message = success, message
+            if rollback_attempted:
+                result.message += f"；{'已自动回滚到' if result.rolled_back else '自动回滚失败，请手动处理，目标'}版本 {result.previous_revision}"
+            return result
+        except Exception as e:
+            result.message = f"更新失败: {str(e)}"
+            if result.rolled_back:
+                result.message += f"；已自动回滚到版本 {result.previous_revision}"
+            self._log(f"[{namespace}/{deployment_name}] {result.message}")
+            return result
+        finally:
+            result.duration = time.time() - start_time
+            result.phases = {name: round(mark - start_time, 3) for name, mark in marks.items()}
+            if self.journal:
+                try:
+                    self.journal.append(result, f"{self.hostname}:{self.port}")
+                except OSError as e:
+                    self._log(f"[{namespace}/{deployment_name}] 写入 rollout 日志失败: {str(e)}")
+
+    def update_images(self, targets, max_workers=4, on_result=None, gate=None):
+        """批量更新多个 deployment（可跨命名空间）的镜像，有界并发
+        Args:
+            targets: (命名空间, deployment名称, 新镜像地址) 的列表，镜像地址的写法同 rollout_image
+            max_workers: 同时进行的 rollout 数，最多 MAX_PARALLEL_ROLLOUTS
+            on_result: 每个 deployment 完成时以 RolloutResult 调用一次，可在工作线程中被调用
+            gate: 应用到每个 deployment 的 RolloutGate
+        Returns:
+            list: 按完成顺序排列的 RolloutResult 列表
+        """
+        targets = list(targets)
+        workers = max(1, min(max_workers, MAX_PARALLEL_ROLLOUTS, len(targets) or 1))
+        self._log(f"开始批量更新 {len(targets)} 个 deployment，并发数 {workers}")
+        results = []
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(self.rollout_image, *target, gate=gate): target for target in targets}
+            for future in as_completed(futures):
+                namespace, deployment_name, new_image = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = RolloutResult(namespace, deployment_name, new_image, message=f"更新失败: {str(e)}")
+                results.append(result)
+                self._log(f"[{len(results)}/{len(targets)}] {namespace}/{deployment_name}: "
+                          f"{'成功' if result.success else '失败'} - {result.message} ({result.duration:.0f}秒)")
+                if on_result:
+                    on_result(result)
+        failed = [f"{result.namespace}/{result.deployment}" for result in results if not result.success]
+        self._log(f"批量更新结束: {len(results) - len(failed)} 个成功，{len(failed)} 个失败"
+                  + (f"（{', '.join(failed)}）" if failed else ""))
+        return results
+
+    def _wait_for_deployment_rollout(self, namespace, deployment_name, timeout=300, marks=None):
+        """等待deployment更新完成
+        在一个 kubectl watch 通道上接收 deployment 的每次状态变化，进度变化时立即输出日志；
+        出现 ProgressDeadlineExceeded / ReplicaFailure，或进度停滞且新Pod处于无法恢复的等待状态时提前判定失败
+        Args:
+            namespace: 命名空间
+            deployment_name: deployment名称
+            timeout: 超时时间（秒）
+            marks: 记录阶段时间戳的字典，写入 first_ready（首个新Pod可用）和 all_ready
+        Returns:
+            tuple: (bool, str) 是否成功及说明
+        """
+        prefix = f"[{namespace}/{deployment_name}]"
+        self._log(f"等待 deployment {deployment_name} 更新完成...")
+        command = f"kubectl get {self._target(namespace, deployment_name)} -o json --watch"
+        stdin, stdout, stderr = self.client.exec_command(command)
+        channel = stdout.channel
+        channel.settimeout(1.0)  # 定期醒来检查超时和停滞
+        decoder = json.JSONDecoder()
+        utf8 = codecs.getincrementaldecoder("utf-8")()
+        buffer = ""
+        deadline = time.time() + timeout
+        selector = ""
+        template_images = []  # 当前 Pod 模板的 [(容器名称, 镜像)]，用于区分新旧Pod
+        last_progress = None
+        last_change = time.time()
+        try:
+            while time.time() < deadline:
+                try:
+                    chunk = channel.recv(65536)
+                except socket.timeout:
+                    chunk = None
+                if chunk == b"":  # kubectl 退出（deployment 不存在或 watch 被服务器关闭）
+                    error = stderr.read().decode().strip()
+                    return False, f"watch 意外结束: {error}" if error else "watch 意外结束"
+                if chunk:
+                    buffer += utf8.decode(chunk)
+                    # watch 输出是多个连续的JSON对象，逐个解出完整对象，剩余部分留待下一块数据
+                    while True:
+                        buffer = buffer.lstrip()
+                        try:
+                            deployment, end = decoder.raw_decode(buffer)
+                        except json.JSONDecodeError:
+                            break  # 对象尚不完整
+                        buffer = buffer[end:]
+                        selector = self._label_selector(deployment) or selector
+                        pod_spec = deployment.get("spec", {}).get("template", {}).get("spec", {})
+                        template_images = [(c["name"], c.get("image")) for kind in ("containers", "initContainers")
+                                           for c in pod_spec.get(kind, [])] or template_images
+                        state, progress = self._rollout_state(deployment)
+                        if marks is not None and self._new_available(deployment) > 0:
+                            marks.setdefault("first_ready", time.time())
+                        if progress != last_progress:
+                            self._log(f"{prefix} {progress}")
+                            last_progress = progress
+                            last_change = time.time()
+                        if state == "complete":
+                            if marks is not None:
+                                marks.setdefault("first_ready", time.time())
+                                marks["all_ready"] = time.time()
+                            self._log(f"Deployment {deployment_name} 更新成功")
+                            return True, "更新成功"
+                        if state == "failed":
+                            self._log(f"{prefix} rollout 失败: {progress}")
+                            return False, progress
+                if selector and time.time() - last_change >= ROLLOUT_STALL_CHECK_INTERVAL:
+                    reason = self._find_failing_pods(namespace, selector, template_images)
+                    if reason:
+                        self._log(f"{prefix} rollout 失败: {reason}")
+                        return False, reason
+                    last_change = time.time()  # 下一次检查再等一个间隔
+            self._log(f"Deployment {deployment_name} 更新超时")
+            return False, f"等待 rollout 超时（{timeout}秒），最后状态: {last_progress or '未知'}"
+        finally:
+            channel.close()
+
+    def _new_pod_states(self, namespace, selector, changes):
+        """查询运行新镜像的Pod的状态
+        Args:
+            changes: [(容器名称, 原镜像, 新镜像)]，所有修改过的容器都已是新镜像的Pod才算新Pod
+        Returns:
+            list: [(Pod名称, 是否Ready, 重启次数, 等待原因集合)]
+        """
+        output, error = self.run_command(
+            f"kubectl get pods -n {shlex.quote(namespace)} -l {shlex.quote(selector)} -o json")
+        if error and not output:
+            raise RuntimeError(error)
+        wanted = {name: new for name, old, new in changes}
+        states = []
+        for pod in json.loads(output).get("items", []):
+            spec = pod.get("spec", {})
+            images = {c["name"]: c.get("image") for kind in ("containers", "initContainers") for c in spec.get(kind, [])}
+            if pod.get("metadata", {}).get("deletionTimestamp") or \
+                    any(images.get(name) != image for name, image in wanted.items()):
+                continue
+            status = pod.get("status", {})
+            container_statuses = status.get("containerStatuses", []) + status.get("initContainerStatuses", [])
+            ready = any(c.get("type") == "Ready" and c.get("status") == "True" for c in status.get("conditions", []))
+            restarts = sum(c.get("restartCount", 0) for c in container_statuses)
+            reasons = {c.get("state", {}).get("waiting", {}).get("reason") for c in container_statuses} - {None}
+            states.append((pod["metadata"]["name"], ready, restarts, reasons))
+        return states
+
+    def _wait_for_new_pods(self, namespace, deployment_name, timeout=CANARY_START_TIMEOUT):
+        """等待控制器处理完本次修改并创建首批新Pod（observedGeneration 追上 generation 且 updatedReplicas 大于0）
+        Returns:
+            tuple: (bool, str) 是否已创建新Pod及说明
+        """
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            output, error = self.run_command(
+                f"kubectl get {self._target(namespace, deployment_name)} -o jsonpath="
+                "'{.metadata.generation} {.status.observedGeneration} {.status.updatedReplicas}'")
+            fields = output.split()
+            try:
+                if len(fields) == 3 and int(fields[1]) >= int(fields[0]) and int(fields[2]) > 0:
+                    return True, ""
+            except ValueError:
+                pass
+            time.sleep(1)
+        return False, f"金丝雀失败: 修改后 {timeout} 秒内没有创建新Pod，请检查配额、准入策略和 deployment 事件"
+
+    def _canary_gate(self, namespace, deployment_name, selector, changes, gate, marks=None, timeout=300):
+        """金丝雀门控：等待首批新Pod就绪，然后在观察期内检查就绪状态和重启次数
+        首个新Pod就绪的时间写入 marks["first_ready"]
+        Returns:
+            tuple: (bool, str) 是否通过及说明
+        """
+        prefix = f"[{namespace}/{deployment_name}]"
+        self._log(f"{prefix} 金丝雀: 已暂停 rollout，等待首批新Pod就绪...")
+        deadline = time.time() + timeout
+        window_end = None
+        while time.time() < deadline:
+            pods = self._new_pod_states(namespace, selector, changes)
+            for name, ready, restarts, reasons in pods:
+                fatal = reasons & ROLLOUT_FATAL_REASONS
+                if fatal:
+                    return False, f"金丝雀失败: Pod {name} 无法启动 ({', '.join(sorted(fatal))})"
+                if restarts > gate.max_restarts:
+                    return False, f"金丝雀失败: Pod {name} 重启了 {restarts} 次"
+                if window_end and not ready:
+                    return False, f"金丝雀失败: Pod {name} 在观察期内变为未就绪"
+            if marks is not None and any(ready for _, ready, _, _ in pods):
+                marks.setdefault("first_ready", time.time())
+            if window_end is None and pods and all(ready for _, ready, _, _ in pods):
+                window_end = time.time() + gate.canary_window
+                deadline = window_end + CANARY_CHECK_INTERVAL
+                self._log(f"{prefix} 金丝雀: {len(pods)} 个新Pod已就绪，观察 {gate.canary_window} 秒...")
+            elif window_end and time.time() >= window_end:
+                self._log(f"{prefix} 金丝雀通过，继续 rollout")
+                return True, "金丝雀通过"
+            time.sleep(CANARY_CHECK_INTERVAL)
+        return False, "金丝雀失败: 等待首批新Pod就绪超时"
+
+    def _prepull_images(self, namespace, deployment_name, deployment, changes, timeout):
+        """在运行该 deployment 的每个节点上启动一个短时 Job 拉取新镜像，等待全部拉取完成
+        Job 的Pod直接指定 nodeName，沿用 deployment 的 imagePullSecrets 和 tolerations；
+        容器命令只是立即退出，拉取完成的标志是容器离开 ContainerCreating 状态。
+        Job 因配额等原因无法创建Pod（FailedCreate 事件，或超过 PREPULL_CREATE_GRACE 秒仍缺少Pod）、
+        或Pod被节点拒绝时按失败处理，不会等到超时
+        Returns:
+            tuple: (bool, str) 镜像拉取失败或预拉取Pod无法创建时为False；超时视为成功（继续 rollout），说明中注明
+        """
+        prefix = f"[{namespace}/{deployment_name}]"
+        selector = self._label_selector(deployment)
+        output, error = self.run_command(
+            f"kubectl get pods -n {shlex.quote(namespace)} -l {shlex.quote(selector)} "
+            "-o jsonpath='{.items[*].spec.nodeName}'")
+        nodes = sorted(set(output.split()))
+        if not nodes:
+            self._log(f"{prefix} 没有运行中的Pod，跳过镜像预拉取")
+            return True, ""
+        images = sorted({new for name, old, new in changes})
+        run_id = uuid.uuid4().hex[:8]
+        pod_spec = deployment["spec"]["template"]["spec"]
+        jobs = []
+        for index, node in enumerate(nodes):
+            jobs.append({
+                "apiVersion": "batch/v1",
+                "kind": "Job",
+                "metadata": {"name": f"prepull-{deployment_name[:40]}-{run_id}-{index}",
+                             "labels": {PREPULL_LABEL: run_id}},
+                "spec": {
+                    "backoffLimit": 0,
+                    "ttlSecondsAfterFinished": 300,
+                    "template": {
+                        "metadata": {"labels": {PREPULL_LABEL: run_id}},
+                        "spec": {
+                            "nodeName": node,
+                            "restartPolicy": "Never",
+                            "imagePullSecrets": pod_spec.get("imagePullSecrets", []),
+                            "tolerations": pod_spec.get("tolerations", []),
+                            "containers": [{"name": f"image-{i}", "image": image, "imagePullPolicy": "IfNotPresent",
+                                            "command": ["sh", "-c", "exit 0"], "resources": PREPULL_RESOURCES}
+                                           for i, image in enumerate(images)],
+                        },
+                    },
+                },
+            })
+        manifest = json.dumps({"apiVersion": "v1", "kind": "List", "items": jobs})
+        output, error = self.run_command(
+            f"echo {shlex.quote(manifest)} | kubectl create -n {shlex.quote(namespace)} -f -")
+        if error and not output:
+            return False, f"创建预拉取任务失败: {error}"
+        self._log(f"{prefix} 开始在 {len(nodes)} 个节点上预拉取 {len(images)} 个镜像")
+        label = f"{PREPULL_LABEL}={run_id}"
+        job_names = {job["metadata"]["name"] for job in jobs}
+        # Pod 状态和 Job 的 FailedCreate 事件在同一次命令中查询
+        poll_command = (f"kubectl get pods -n {shlex.quote(namespace)} -l {label} -o json; "
+                        f"echo {PREPULL_EVENTS_MARKER}; "
+                        f"kubectl get events -n {shlex.quote(namespace)} "
+                        "--field-selector involvedObject.kind=Job,reason=FailedCreate -o json")
+        start_time = time.time()
+        last_done = -1
+        try:
+            while time.time() - start_time < timeout:
+                output, error = self.run_command(poll_command)
+                pods_output, _, events_output = output.partition(PREPULL_EVENTS_MARKER)
+                pods = json.loads(pods_output.strip() or "{}").get("items", [])
+                done, failed = self._prepull_progress(pods)
+                if failed:
+                    return False, f"镜像预拉取失败: {'; '.join(failed)}"
+                create_errors = sorted({event.get("message", "")
+                                        for event in json.loads(events_output.strip() or "{}").get("items", [])
+                                        if event.get("involvedObject", {}).get("name") in job_names})
+                if create_errors:
+                    return False, f"预拉取任务无法创建Pod: {'; '.join(create_errors)}"
+                if len(pods) < len(nodes) and time.time() - start_time > PREPULL_CREATE_GRACE:
+                    return False, (f"预拉取任务在 {PREPULL_CREATE_GRACE} 秒内只创建了 {len(pods)}/{len(nodes)} 个Pod，"
+                                   "请检查命名空间的配额和准入策略")
+                if done != last_done:
+                    self._log(f"{prefix} 镜像预拉取: {done}/{len(nodes)} 个节点完成")
+                    last_done = done
+                if done >= len(nodes):
+                    self._log(f"{prefix} 镜像预拉取完成，用时 {time.time() - start_time:.0f} 秒")
+                    return True, ""
+                time.sleep(PREPULL_CHECK_INTERVAL)
+            self._log(f"{prefix} 镜像预拉取超时（{timeout}秒），{last_done}/{len(nodes)} 个节点完成，继续 rollout")
+            return True, "镜像预拉取超时"
+        finally:
+            self.run_command(f"kubectl delete jobs -n {shlex.quote(namespace)} -l {label} --wait=false")
+
+    @staticmethod
+    def _prepull_progress(pods):
+        """统计预拉取Pod的进度
+        Returns:
+            tuple: (int, list) 所有镜像都已拉取到本地的节点数，以及拉取失败的说明
+        """
+        done = 0
+        failed = []
+        for pod in pods:
+            statuses = pod.get("status", {}).get("containerStatuses", [])
+            containers = pod.get("spec", {}).get("containers", [])
+            reasons = [status.get("state", {}).get("waiting", {}).get("reason") for status in statuses]
+            node = pod.get("spec", {}).get("nodeName", "")
+            # 指定 nodeName 的Pod不经过调度器，资源不足时由 kubelet 直接拒绝（如 OutOfcpu），没有容器状态
+            if pod.get("status", {}).get("phase") == "Failed" and not statuses:
+                failed.append(f"{node}: Pod被拒绝 ({pod['status'].get('reason', '')} {pod['status'].get('message', '')})")
+                continue
+            for status, reason in zip(statuses, reasons):
+                if reason in PREPULL_FAILED_REASONS:
+                    failed.append(f"{node}: {status.get('image')} ({reason})")
+            # 容器已运行、已退出或因其他原因（如镜像中没有 sh）无法启动，都说明镜像已在节点上
+            if len(statuses) == len(containers) and not any(reason in PREPULL_PENDING_REASONS | PREPULL_FAILED_REASONS
+                                                             for reason in reasons):
+                done += 1
+        return done, failed
+
+    @staticmethod
+    def _image_patch(changes, original=False):
+        """把容器修改转换为一次 strategic merge patch，容器列表按 name 合并，未列出的容器保持不变
+        Args:
+            changes: resolve_image_updates 返回的 [(类型, 容器名称, 原镜像, 新镜像)]
+            original: 为True时写回原镜像（暂停状态下的回滚）
+        Returns:
+            str: JSON 格式的 patch
+        """
+        patch = {"spec": {"template": {"spec": {}}}}
+        for kind, name, old, new in changes:
+            patch["spec"]["template"]["spec"].setdefault(kind, []).append({"name": name, "image": old if original else new})
+        return json.dumps(patch)
+
+    def _rollback(self, namespace, deployment_name, revision, restore=None):
+        """回滚并等待回滚完成
+        Args:
+            revision: rollout undo 的目标版本
+            restore: deployment 处于暂停状态（金丝雀失败）时传入本次的容器修改。kubectl 拒绝对暂停中的
+                     deployment 执行 rollout undo，因此先用 patch 把镜像改回原值再 resume，控制器直接扩容原来的
+                     ReplicaSet；patch 失败时退回为先恢复再按版本回滚
+        Returns:
+            bool: 是否回滚成功
+        """
+        prefix = f"[{namespace}/{deployment_name}]"
+        target = self._target(namespace, deployment_name)
+        status = None
+        if restore:
+            self._log(f"{prefix} 自动回滚：恢复原镜像...")
+            status, output, error = self.run_command_status(
+                f"kubectl patch {target} --type strategic -p {shlex.quote(self._image_patch(restore, original=True))}")
+            self.run_command(f"kubectl rollout resume {target}")
+            if status != 0:
+                self._log(f"{prefix} 恢复原镜像失败（{error or output}），改为回滚到版本 {revision}")
+        if status != 0:
+            if not restore:
+                self._log(f"{prefix} 自动回滚到版本 {revision}...")
+            status, output, error = self.run_command_status(
+                f"kubectl rollout undo {target} --to-revision={revision or 0}")
+        if status != 0:
+            self._log(f"{prefix} 回滚失败: {error}")
+            return False
+        success, message = self._wait_for_deployment_rollout(namespace, deployment_name)
+        self._log(f"{prefix} 回滚{'完成' if success else '未完成: ' + message}")
+        return success
+
+    @staticmethod
+    def _target(namespace, deployment_name):
+        """kubectl 命令中的 deployment 参数，名称和命名空间都经过 shell 转义（批量模式和发布计划中可由用户任意输入）"""
+        return f"deployment/{shlex.quote(deployment_name)} -n {shlex.quote(namespace)}"
+
+    @staticmethod
+    def _label_selector(deployment):
+        """从 deployment 对象的 spec.selector.matchLabels 构造 -l 参数"""
+        labels = deployment.get("spec", {}).get("selector", {}).get("matchLabels", {})
+        return ",".join(f"{key}={value}" for key, value in sorted(labels.items()))
+
+    @staticmethod
+    def _rollout_state(deployment):
+        """按 kubectl rollout status 的规则判断 deployment 的 rollout 状态
+        Args:
+            deployment: deployment 对象（kubectl -o json 的输出）
+        Returns:
+            tuple: (str, str) 状态（"progressing"、"complete" 或 "failed"）及进度说明
+        """
+        metadata = deployment.get("metadata", {})
+        status = deployment.get("status", {})
+        if status.get("observedGeneration", 0) < metadata.get("generation", 0):
+            return "progressing", "等待控制器处理新的版本"
+        for condition in status.get("conditions", []):
+            if condition.get("type") == "Progressing" and condition.get("reason") == "ProgressDeadlineExceeded":
+                return "failed", f"超过 progressDeadlineSeconds 仍未完成: {condition.get('message', '')}"
+            if condition.get("type") == "ReplicaFailure" and condition.get("status") == "True":
+                return "failed", f"创建副本失败: {condition.get('message', '')}"
+        desired = deployment.get("spec", {}).get("replicas", 1)
+        updated = status.get("updatedReplicas", 0)
+        total = status.get("replicas", 0)
+        available = status.get("availableReplicas", 0)
+        progress = f"已更新 {updated}/{desired}，可用 {available}/{desired}"
+        if total > updated:
+            progress += f"，{total - updated} 个旧副本待终止"
+        if updated < desired or total > updated or available < updated:
+            return "progressing", progress
+        return "complete", progress
+
+    @staticmethod
+    def _new_available(deployment):
+        """估算已可用的新Pod数：可用副本数减去尚存的旧副本数（假设旧副本都可用，结果是下限）"""
+        metadata = deployment.get("metadata", {})
+        status = deployment.get("status", {})
+        if status.get("observedGeneration", 0) < metadata.get("generation", 0):
+            return 0  # status 仍是旧版本的统计
+        updated = status.get("updatedReplicas", 0)
+        old = status.get("replicas", 0) - updated
+        return min(updated, status.get("availableReplicas", 0) - old)
+
+    def _find_failing_pods(self, namespace, selector, template_images):
+        """查找运行当前Pod模板镜像、且处于无法恢复的等待状态（如 ImagePullBackOff、CrashLoopBackOff）的Pod
+        旧 ReplicaSet 的Pod不计入：修复一个本已崩溃的 deployment 时，旧Pod的 CrashLoopBackOff 不能算作本次失败
+        Args:
+            template_images: 当前Pod模板的 [(容器名称, 镜像)]
+        Returns:
+            str: 失败说明，没有找到时为空字符串
+        """
+        changes = [(name, None, image) for name, image in template_images]
+        try:
+            pods = self._new_pod_states(namespace, selector, changes)
+        except (RuntimeError, ValueError):
+            return ""  # 查询失败时不判定，继续等待 watch
+        failing = []
+        for name, ready, restarts, reasons in pods:
+            fatal = sorted(reasons & ROLLOUT_FATAL_REASONS)
+            if fatal:
+                failing.append(f"{name} ({', '.join(fatal)})")
+        return f"Pod 无法启动: {'; '.join(failing)}" if failing else ""
+
+    def close(self):
+        """关闭SSH连接"""
+        if self.client:
+            self.client.close()
+            self._log("已关闭连接")
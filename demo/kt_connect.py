@@ -1,11 +1,22 @@
 import sys
 import subprocess
+import threading
+import time
+from collections import deque
+from queue import Queue, Empty
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QLabel, QLineEdit, QPushButton, QTextEdit, QFileDialog, QMessageBox
 )
 from PyQt6.QtCore import QThread, pyqtSignal
 
+# 日志合并发送的间隔（毫秒）：期间读到的所有行合并为一次信号，避免每行一次界面刷新
+LOG_FLUSH_INTERVAL_MS = 200
+# 日志区最多保留的行数，超出后丢弃最早的行，长时间运行也不会持续占用内存
+LOG_MAX_LINES = 5000
+# 命令失败时在错误信息中显示的 stderr 末尾行数
+STDERR_TAIL_LINES = 50
+
 class CmdThread(QThread):
     log_signal = pyqtSignal(str)
     finished_signal = pyqtSignal(bool, str)
@@ -27,23 +38,54 @@ class CmdThread(QThread):
                 powershell_cmd,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                text=True
+                text=True,
+                errors="replace"
             )
-            # 实时输出日志
-            while True:
-                line = proc.stdout.readline()
-                if not line:
-                    break
-                self.log_signal.emit(line)
+            # stdout 和 stderr 各由一个线程读取，任一管道写满都不会阻塞子进程
+            lines = Queue()
+            stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+            readers = [
+                threading.Thread(target=self._read_stream, args=(proc.stdout, lines, ""), daemon=True),
+                threading.Thread(target=self._read_stream, args=(proc.stderr, lines, "[stderr] ", stderr_tail),
+                                 daemon=True),
+            ]
+            for reader in readers:
+                reader.start()
+            # 实时输出日志，按固定间隔合并发送
+            batch = []
+            flush_at = time.monotonic() + LOG_FLUSH_INTERVAL_MS / 1000
+            while any(reader.is_alive() for reader in readers) or not lines.empty():
+                try:
+                    batch.append(lines.get(timeout=max(0.0, flush_at - time.monotonic())))
+                except Empty:
+                    pass
+                if time.monotonic() >= flush_at:
+                    if batch:
+                        self.log_signal.emit("".join(batch).rstrip("\n"))
+                        batch = []
+                    flush_at = time.monotonic() + LOG_FLUSH_INTERVAL_MS / 1000
+            if batch:
+                self.log_signal.emit("".join(batch).rstrip("\n"))
             proc.wait()
             if proc.returncode == 0:
                 self.finished_signal.emit(True, "命令执行成功")
             else:
-                err = proc.stderr.read()
+                err = "".join(stderr_tail)
                 self.finished_signal.emit(False, f"命令执行失败: {err}")
         except Exception as e:
             self.finished_signal.emit(False, f"发生异常: {str(e)}")
 
+    @staticmethod
+    def _read_stream(stream, lines, prefix, tail=None):
+        # 逐行读到 EOF，放入队列由 run 合并发送；tail 保留最后若干行用于错误信息
+        for line in stream:
+            if not line.endswith("\n"):
+                line += "\n"
+            lines.put(prefix + line)
+            if tail is not None:
+                tail.append(line)
+        stream.close()
+
 class KtctlGUI(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -78,6 +120,7 @@ class KtctlGUI(QMainWindow):
         # 日志输出
         self.log_area = QTextEdit()
         self.log_area.setReadOnly(True)
+        self.log_area.document().setMaximumBlockCount(LOG_MAX_LINES)
         layout.addWidget(self.log_area)
 
     def choose_file(self):
@@ -0,0 +1,136 @@
+"""服务器资源监视器的命令行 / 守护进程入口。
+
+只依赖 server_resource_core，不导入 PyQt6，可以在没有图形界面的服务器上或 cron 中运行：
+
+    # 采集一次并以文本输出（适合 cron）
+    python server_resource_cli.py --host 192.168.2.36 --port 3622 --user root --password-env SRM_PASSWORD
+
+    # 每10秒并发采集清单中的所有主机，以 JSON Lines 追加写入文件，并输出告警事件
+    python server_resource_cli.py --inventory hosts.json --interval 10 --format json --output metrics.jsonl --alerts
+"""
+import argparse
+import json
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from server_resource_core import (DEFAULT_COMMAND_TIMEOUT, AlertEngine, build_hosts, format_snapshot, poll_host,
+                                  ssh_pool)
+
+
+def parse_args(argv=None):
+    """解析命令行参数。"""
+    parser = argparse.ArgumentParser(description="无界面的服务器资源监视器")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--inventory", help="JSON主机清单文件，格式同GUI的批量监控")
+    target.add_argument("--host", help="单台主机的主机名或IP")
+    parser.add_argument("--port", type=int, default=22, help="SSH端口，默认22")
+    parser.add_argument("--user", help="SSH用户名（使用 --host 时必填）")
+    parser.add_argument("--password-env", default="SRM_PASSWORD",
+                        help="从该环境变量读取SSH密码，默认 SRM_PASSWORD（避免密码出现在进程列表中）")
+    parser.add_argument("--key-file", help="SSH私钥文件路径")
+    parser.add_argument("--interval", type=float, default=0,
+                        help="采集间隔（秒），0表示只采集一次后退出，默认0")
+    parser.add_argument("--count", type=int, default=0, help="最多采集的轮数，0表示不限制")
+    parser.add_argument("--workers", type=int, default=8, help="并发采集的主机数，默认8")
+    parser.add_argument("--format", choices=["text", "json"], default="text", help="输出格式：文本或 JSON Lines")
+    parser.add_argument("--output", help="追加写入的文件路径，默认输出到标准输出")
+    parser.add_argument("--no-batch", action="store_true", help="逐条执行指标命令，而不是合并为一次往返")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_COMMAND_TIMEOUT,
+                        help=f"单条远程命令的超时（秒），超时的主机记为失败，默认{DEFAULT_COMMAND_TIMEOUT}")
+    parser.add_argument("--top", type=int, default=0,
+                        help="同时输出CPU和内存占用最高的N个进程，0表示不采集，默认0")
+    parser.add_argument("--cpu-window", type=float, default=1.0,
+                        help="首次采集某台主机时CPU使用率的采样窗口（秒）：先读取一次计数，等待后再采集；"
+                             "0表示不等待（单次运行时会得到开机以来的平均值），默认1")
+    parser.add_argument("--alerts", action="store_true", help="按默认告警规则检查并输出告警/恢复事件")
+    args = parser.parse_args(argv)
+    if args.host and not args.user:
+        parser.error("使用 --host 时必须提供 --user")
+    return args
+
+
+def poll_round(hosts, executor, batched, top_n=0, command_timeout=DEFAULT_COMMAND_TIMEOUT, cpu_window=0):
+    """并发采集一轮，按完成顺序产出 (主机, 是否成功, 快照或错误信息)。"""
+    futures = {executor.submit(poll_host, host, ssh_pool, batched, top_n, command_timeout, cpu_window): host
+               for host in hosts}
+    for future in as_completed(futures):
+        host = futures[future]
+        try:
+            success, result = future.result()
+        except Exception as e:
+            success, result = False, f"采集失败: {str(e)}"
+        yield host, success, result
+
+
+def format_record(host, success, result, output_format):
+    """把单台主机的采集结果格式化为一条输出记录。"""
+    if output_format == "json":
+        record = {"type": "snapshot", "name": host["name"]}
+        if success:
+            record.update(result.to_dict())
+        else:
+            record.update({"hostname": host["hostname"], "port": host["port"],
+                           "timestamp": time.time(), "error": result})
+        return json.dumps(record, ensure_ascii=False)
+    if success:
+        return format_snapshot(result)
+    return f"服务器: {host['hostname']}:{host['port']}\n错误: {result}"
+
+
+def format_alert(event, output_format):
+    """把告警事件格式化为一条输出记录。"""
+    if output_format == "json":
+        return json.dumps({"type": "alert", "rule": event.rule, "host": event.host, "subject": event.subject,
+                           "state": event.state, "value": event.value, "timestamp": event.timestamp},
+                          ensure_ascii=False)
+    return str(event)
+
+
+def main(argv=None):
+    """程序入口。返回值为进程退出码：最后一轮所有主机都采集成功时为0，否则为1。"""
+    args = parse_args(argv)
+    try:
+        hosts = build_hosts(args.inventory, args.host, args.port, args.user, args.password_env, args.key_file)
+    except (OSError, ValueError) as e:
+        print(f"无法加载主机清单: {str(e)}", file=sys.stderr)
+        return 2
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+    alert_engine = AlertEngine() if args.alerts else None
+    out = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+    all_succeeded = True
+    rounds = 0
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+            while not stop_event.is_set():
+                started = time.monotonic()
+                all_succeeded = True
+                for host, success, result in poll_round(hosts, executor, not args.no_batch, args.top,
+                                                        args.timeout, args.cpu_window):
+                    all_succeeded = all_succeeded and success
+                    print(format_record(host, success, result, args.format), file=out)
+                    if alert_engine and success:
+                        for event in alert_engine.evaluate(f"{result.hostname}:{result.port}",
+                                                           result.metric_values(), result.timestamp):
+                            print(format_alert(event, args.format), file=out)
+                out.flush()
+                rounds += 1
+                if args.interval <= 0 or (args.count and rounds >= args.count):
+                    break
+                # 按固定节奏采集：扣除本轮耗时；等待期间收到 SIGTERM 会立即退出
+                stop_event.wait(max(0.0, args.interval - (time.monotonic() - started)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ssh_pool.close_all()
+        if out is not sys.stdout:
+            out.close()
+    return 0 if all_succeeded else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
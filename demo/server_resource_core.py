@@ -0,0 +1,1736 @@
+"""服务器资源监控的核心逻辑：SSH连接池、指标采集与解析、Pod查询、指标历史与告警。
+
+本模块不依赖 PyQt6，图形界面 (server_resource_monitor.py)、命令行 (server_resource_cli.py) 与 Prometheus 导出器 (server_resource_exporter.py) 共用。
+"""
+import codecs
+import heapq
+import json
+import math
+import operator
+import os
+import re
+import select
+import shlex
+import socket
+import threading
+import time
+import urllib.parse
+import uuid
+from array import array
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+import paramiko
+
+# 磁盘段中分隔容量与inode两部分 df 输出的标记（AGENT_SCRIPT 中直接写了同样的字面值）
+DISK_INODES_MARKER = "__SRM_INODES__"
+# 不计入磁盘清单的文件系统类型：内存文件系统和容器的联合挂载，它们不会被业务数据写满
+EXCLUDED_FS_TYPES = frozenset({"tmpfs", "devtmpfs", "ramfs", "overlay", "squashfs", "shm", "nsfs", "autofs"})
+
+# 各项指标对应的远程命令（段名 -> 命令），逐条采集与批量采集共用。
+# 都只读取原始数值，解析与格式化在本地完成。
+METRIC_COMMANDS = {
+    "uptime": "cat /proc/uptime",
+    # 只读取 /proc/stat 的汇总行，不做任何等待，CPU使用率由两次采样之间的差值计算
+    "cpu": "head -n1 /proc/stat",
+    "memory": "free -m | grep Mem",
+    # 所有已挂载的文件系统：先输出容量 (df -PTk)，再输出inode (df -PTi)；可移植的 df 无法在一次输出中同时给出两者
+    "disk": f"df -PTk 2>/dev/null; echo {DISK_INODES_MARKER}; df -PTi 2>/dev/null",
+    "load": "cat /proc/loadavg",
+}
+
+# 进程命令行的最大显示长度
+PROCESS_COMMAND_MAX_LEN = 120
+PROCESS_CMDLINE_MARKER = "__SRM_CMDLINE__"
+# 进程快照：第一行为 CLK_TCK 和页大小，第二行为 /proc/uptime，其后是所有进程的 /proc/<pid>/stat；
+# PROCESS_CMDLINE_MARKER 之后是各进程命令行的前 PROCESS_COMMAND_MAX_LEN 字节，
+# 由 head 在每个文件前输出 "==> /proc/<pid>/cmdline <==" 标题。
+# 只读取一次 /proc，命令行与进程统计在同一次往返中取得；进程的CPU使用率由两次采样之间的时钟节拍差值计算
+PROCESS_COMMAND = ("echo $(getconf CLK_TCK) $(getconf PAGESIZE); cat /proc/uptime; cat /proc/[0-9]*/stat 2>/dev/null; "
+                   f"echo; echo {PROCESS_CMDLINE_MARKER}; "
+                   f"head -c {PROCESS_COMMAND_MAX_LEN} /proc/[0-9]*/cmdline 2>/dev/null")
+PROCESS_CMDLINE_HEADER = re.compile(r"^==> /proc/(\d+)/cmdline <==$")
+
+# 单条远程命令的默认超时（秒）。超时后关闭通道，不再等待挂起的 kubectl 或卡在NFS上的 df
+DEFAULT_COMMAND_TIMEOUT = 30
+
+# 批量采集：所有段落在一次SSH往返中执行，每段输出前打印该标记 + 段名
+BATCH_SECTION_MARKER = "__SRM_SECTION__:"
+
+# 远程采集代理（POSIX sh）：启动后每隔 $1 秒输出一行JSON，各字段与 METRIC_COMMANDS 的原始输出格式相同，
+# 因此可以直接复用本地的解析逻辑。除 df 和 sleep 外只使用 shell 内建命令读取 /proc，不再每次采集都启动一串管道。
+AGENT_SCRIPT = r"""#!/bin/sh
+interval=${1:-1}
+rm -f "$0" # 脚本已被 sh 读取，删除临时文件
+trap 'exit 0' HUP PIPE TERM
+while :; do
+    read -r uptime _ < /proc/uptime
+    read -r cpu < /proc/stat
+    read -r load < /proc/loadavg
+    mem_total=0; mem_avail=0
+    while read -r key value _; do
+        case $key in
+            MemTotal:) mem_total=$value ;;
+            MemAvailable:) mem_avail=$value ;;
+        esac
+    done < /proc/meminfo
+    disk=$({ df -PTk; echo __SRM_INODES__; df -PTi; } 2>/dev/null | { sep=; while read -r line; do printf '%s%s' "$sep" "$line"; sep='\n'; done; })
+    printf '{"uptime":"%s","cpu":"%s","memory":"Mem: %d %d","disk":"%s","load":"%s"}\n' \
+        "$uptime" "$cpu" $((mem_total / 1024)) $(((mem_total - mem_avail) / 1024)) "$disk" "$load" || exit 0
+    sleep "$interval"
+done
+"""
+
+# 每台主机上一次的CPU计数快照 {(hostname, port): (busy, total, CpuUsage)}。
+# 监视器实例每次操作都会重新创建，所以快照放在模块级别，跨实例、跨线程共享。
+_cpu_snapshots = {}
+_cpu_snapshots_lock = threading.Lock()
+
+# 每台主机上一次的进程快照 {(hostname, port): (uptime秒数, {pid: (启动时间, 累计节拍)})}，用于计算进程CPU使用率
+_process_snapshots = {}
+_process_snapshots_lock = threading.Lock()
+
+# 一次列出所有节点的 名称\tInternalIP\tExternalIP，替代逐个节点 kubectl get node -o json
+NODE_IP_COMMAND = ("kubectl get nodes -o jsonpath='{range .items[*]}{.metadata.name}{\"\\t\"}"
+                   "{.status.addresses[?(@.type==\"InternalIP\")].address}{\"\\t\"}"
+                   "{.status.addresses[?(@.type==\"ExternalIP\")].address}{\"\\n\"}{end}'")
+
+# Pod列表投影：每个Pod一行 名称\t状态\t节点\t容器镜像(空格分隔)\tinit容器镜像(空格分隔)
+POD_PROJECTION_JSONPATH = ('{range .items[*]}{.metadata.name}{"\\t"}{.status.phase}{"\\t"}{.spec.nodeName}{"\\t"}'
+                           '{.spec.containers[*].image}{"\\t"}{.spec.initContainers[*].image}{"\\n"}{end}')
+
+# Pod监视被 API server 关闭后，重新 list + watch 之前的等待时间（秒）
+WATCH_RESTART_DELAY = 1
+
+# 节点IP映射的缓存 {(hostname, port): (获取时间, {节点名: IP})}，默认缓存60秒
+NODE_IP_CACHE_TTL = 60
+_node_ip_cache = {}
+_node_ip_cache_lock = threading.Lock()
+
+# 指标历史：每个 (主机, 指标) 保留的采样点数。自动刷新间隔为10秒时约为4小时
+HISTORY_CAPACITY = 1440
+# 参与历史趋势的指标：(键, 显示名称, 纵轴上限)，上限为None时按数据自身的最大值缩放
+HISTORY_METRICS = [
+    ("cpu", "CPU%", 100.0),
+    ("memory", "内存%", 100.0),
+    ("disk", "磁盘/%", 100.0),
+    ("load", "负载", None),
+]
+SPARKLINE_CHARS = "▁▂▃▄▅▆▇█"
+SPARKLINE_WIDTH = 60
+
+
+class SSHConnectionPool:
+    """按 (hostname, port, username) 复用SSH连接的连接池。
+
+    paramiko 的 Transport 支持在同一连接上并发打开多个通道，所以同一主机的
+    多个监控任务可以共享一个已完成握手的连接，每次操作只需付出一次命令往返。
+    """
+    def __init__(self, keepalive_interval=30, idle_timeout=300, connect_timeout=10):
+        """初始化连接池。
+
+        Args:
+            keepalive_interval (int, optional): SSH保活包发送间隔（秒）。默认为30。
+            idle_timeout (int, optional): 连接空闲多久后被回收（秒）。默认为300。
+            connect_timeout (int, optional): 建立新连接的超时时间（秒）。默认为10。
+        """
+        self.keepalive_interval = keepalive_interval
+        self.idle_timeout = idle_timeout
+        self.connect_timeout = connect_timeout
+        self._entries = {}  # {(hostname, port, username): {"client", "credentials", "last_used", "leases"}}
+        self._key_locks = {}  # {(hostname, port, username): threading.Lock}
+        self._lock = threading.Lock()
+        self._sweep_lock = threading.Lock()  # 同一时间只进行一次健康探测
+
+    @staticmethod
+    def _is_healthy(client):
+        """检查连接的传输层是否仍然可用。"""
+        transport = client.get_transport() if client else None
+        if transport is None or not transport.is_active():
+            return False
+        try:
+            transport.send_ignore() # 发送一个忽略包，探测底层TCP连接是否已断开
+            return True
+        except Exception:
+            return False
+
+    def _open(self, hostname, port, username, password, key_filename):
+        """建立一个新的SSH连接并开启保活。"""
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy()) # 自动添加主机密钥
+        if key_filename:
+            client.connect(hostname=hostname, port=port, username=username,
+                           key_filename=key_filename, timeout=self.connect_timeout)
+        else:
+            client.connect(hostname=hostname, port=port, username=username,
+                           password=password, timeout=self.connect_timeout)
+        client.get_transport().set_keepalive(self.keepalive_interval)
+        return client
+
+    def acquire(self, hostname, port, username, password=None, key_filename=None):
+        """获取一个可用的连接，必要时新建或重连。
+
+        Returns:
+            tuple: (paramiko.SSHClient or None, str or None) 连接实例与错误信息。
+        """
+        # 只回收空闲超时的连接，不探测其他主机的连接；需要发包探测的完整清理由定时任务执行
+        self.evict_idle(check_health=False)
+        key = (hostname, port, username)
+        credentials = (password, key_filename)
+        # 每个主机一把锁：同一主机的并发请求只建立一个连接，不同主机之间的握手互不阻塞
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry and entry["credentials"] == credentials and self._is_healthy(entry["client"]):
+                with self._lock:
+                    entry["last_used"] = time.monotonic()
+                    entry["leases"] += 1
+                return entry["client"], None
+            if entry: # 连接已失效或凭据已变化，关闭后重连
+                self.invalidate(hostname, port, username)
+            try:
+                client = self._open(hostname, port, username, password, key_filename)
+            except Exception as e:
+                return None, f"连接失败: {str(e)}"
+            with self._lock:
+                self._entries[key] = {"client": client, "credentials": credentials, "last_used": time.monotonic(),
+                                      "leases": 1}
+            return client, None
+
+    def release(self, hostname, port, username, client=None):
+        """归还连接（连接保持打开），减少其借用计数并刷新最近使用时间。
+
+        Args:
+            client (paramiko.SSHClient, optional): 借出的连接。提供时只有池中仍是同一个连接才减少计数，
+                                                   避免归还一个已被重连替换掉的旧连接。默认为None。
+        """
+        with self._lock:
+            entry = self._entries.get((hostname, port, username))
+            if entry and (client is None or entry["client"] is client):
+                entry["leases"] = max(0, entry["leases"] - 1)
+                entry["last_used"] = time.monotonic()
+
+    def invalidate(self, hostname, port, username):
+        """丢弃并关闭指定连接，下次 acquire 时会重新建立。"""
+        with self._lock:
+            entry = self._entries.pop((hostname, port, username), None)
+        if entry:
+            entry["client"].close()
+
+    def evict_idle(self, check_health=True):
+        """关闭空闲超时或已失效的连接。仍被借用的连接（如实时监视、采集代理的长连接）不会因空闲而被回收。
+
+        健康探测 (send_ignore) 需要网络往返，重新协商密钥时可能阻塞数十秒，因此在全局锁之外进行，
+        不会阻塞其他线程的 acquire 和 release。上一次探测尚未结束时跳过本次探测。
+
+        Args:
+            check_health (bool, optional): 为True时同时探测其余连接是否仍可用。默认为True。
+
+        Returns:
+            int: 关闭的连接数。
+        """
+        now = time.monotonic()
+        with self._lock:
+            idle = [key for key, entry in self._entries.items()
+                    if entry["leases"] == 0 and now - entry["last_used"] > self.idle_timeout]
+            entries = [self._entries.pop(key) for key in idle]
+            remaining = list(self._entries.items())
+        if check_health and self._sweep_lock.acquire(blocking=False):
+            try:
+                broken = [(key, entry) for key, entry in remaining if not self._is_healthy(entry["client"])]
+                with self._lock:
+                    # 探测期间连接可能已被重连替换，只移除仍是同一条目的连接
+                    entries += [self._entries.pop(key) for key, entry in broken if self._entries.get(key) is entry]
+            finally:
+                self._sweep_lock.release()
+        for entry in entries:
+            entry["client"].close()
+        return len(entries)
+
+    def close_all(self):
+        """关闭池中的所有连接。"""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            entry["client"].close()
+
+
+# 进程内共享的全局连接池
+ssh_pool = SSHConnectionPool()
+
+
+@dataclass
+class CpuUsage:
+    """CPU使用率。"""
+    percent: float
+    since_boot: bool = False  # 为True表示首次采样，数值是开机以来的平均值
+
+
+@dataclass
+class MemoryUsage:
+    """内存使用情况，单位MB。"""
+    used_mb: int
+    total_mb: int
+
+    @property
+    def percent(self):
+        return self.used_mb / self.total_mb * 100 if self.total_mb else 0.0
+
+
+@dataclass
+class DiskUsage:
+    """单个挂载点的磁盘使用情况，容量单位KB。"""
+    mount: str
+    filesystem: str
+    size_kb: int
+    used_kb: int
+    avail_kb: int
+    use_percent: float
+    fs_type: str = ""
+    inodes_total: Optional[int] = None  # 文件系统不支持inode统计时为None
+    inodes_used: Optional[int] = None
+
+    @property
+    def inode_percent(self):
+        return self.inodes_used / self.inodes_total * 100 if self.inodes_total else None
+
+
+@dataclass
+class LoadAverage:
+    """系统平均负载。"""
+    load1: float
+    load5: float
+    load15: float
+
+
+@dataclass
+class CommandResult:
+    """远程命令的执行结果。"""
+    stdout: str = ""
+    stderr: str = ""
+    exit_status: Optional[int] = None  # 超时、被取消或通道异常时为None
+    timed_out: bool = False
+    cancelled: bool = False
+    error: Optional[str] = None  # 未能正常完成时的错误信息（未连接、通道异常、超时、取消）
+
+
+@dataclass
+class ProcessUsage:
+    """单个进程的资源占用。"""
+    pid: int
+    name: str
+    state: str
+    cpu_percent: float  # 按单核计算，多线程进程可能超过100%，与 top 一致
+    rss_kb: int
+    command: str = ""  # 完整命令行，内核线程为空
+    since_start: bool = False  # 为True表示首次采样，数值是进程启动以来的平均值
+
+
+@dataclass
+class ResourceSnapshot:
+    """一次采集得到的主机资源快照。取不到的指标为None，errors 记录 {段名: 错误信息}。"""
+    hostname: str
+    port: int
+    timestamp: float
+    uptime_seconds: Optional[float] = None
+    cpu: Optional[CpuUsage] = None
+    memory: Optional[MemoryUsage] = None
+    disks: List[DiskUsage] = field(default_factory=list)
+    load: Optional[LoadAverage] = None
+    top_cpu: List[ProcessUsage] = field(default_factory=list)  # CPU占用最高的进程，按降序排列
+    top_memory: List[ProcessUsage] = field(default_factory=list)  # RSS最高的进程，按降序排列
+    errors: Dict[str, str] = field(default_factory=dict)
+    timed_out: bool = False  # 为True表示采集命令超时被取消，errors["command"] 记录原因
+
+    def to_dict(self):
+        """转换为可JSON序列化的字典，附带内存使用百分比等派生字段。"""
+        data = asdict(self)
+        if self.memory:
+            data["memory"]["percent"] = round(self.memory.percent, 2)
+        return data
+
+    def disk(self, mount):
+        """按挂载点查找磁盘使用情况。"""
+        return next((disk for disk in self.disks if disk.mount == mount), None)
+
+    def metric_values(self):
+        """返回用于趋势和阈值判断的数值指标，缺失的指标不包含在内。
+
+        键为 "cpu"、"memory"、"disk"（根分区）、"load"（1分钟），
+        以及每个挂载点的 "disk:<挂载点>" 和 "inodes:<挂载点>"（inode使用率）。
+        """
+        values = {}
+        if self.cpu:
+            values["cpu"] = self.cpu.percent
+        if self.memory:
+            values["memory"] = self.memory.percent
+        root_disk = self.disk("/")
+        if root_disk:
+            values["disk"] = root_disk.use_percent
+        for disk in self.disks:
+            values[f"disk:{disk.mount}"] = disk.use_percent
+            if disk.inode_percent is not None:
+                values[f"inodes:{disk.mount}"] = disk.inode_percent
+        if self.load:
+            values["load"] = self.load.load1
+        return values
+
+
+class ServerResourceMonitor:
+    """处理SSH连接并获取服务器资源信息。"""
+    def __init__(self, hostname, username, password=None, port=22, key_filename=None, pool=None,
+                 node_ip_cache_ttl=NODE_IP_CACHE_TTL, command_timeout=DEFAULT_COMMAND_TIMEOUT):
+        """初始化服务器资源监视器。
+
+        Args:
+            hostname (str): 服务器的主机名或IP地址。
+            username (str): SSH登录用户名。
+            password (str, optional): SSH登录密码。默认为None。
+            port (int, optional): SSH端口。默认为22。
+            key_filename (str, optional): SSH私钥文件路径。默认为None。
+            pool (SSHConnectionPool, optional): 连接池。提供时从池中复用连接，close() 只归还不断开。默认为None。
+            node_ip_cache_ttl (int, optional): 节点IP映射的缓存时间（秒），0表示不缓存。默认为NODE_IP_CACHE_TTL。
+            command_timeout (float, optional): 单条命令的超时（秒），0或None表示不限制。默认为DEFAULT_COMMAND_TIMEOUT。
+        """
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.key_filename = key_filename  # SSH密钥文件，暂未在UI中实现输入
+        self.pool = pool
+        self.node_ip_cache_ttl = node_ip_cache_ttl
+        self.command_timeout = command_timeout
+        self.client = None  # paramiko SSH客户端实例
+        self._cancel_event = threading.Event()
+        self._channels = set()  # 正在执行命令的通道，cancel() 时全部关闭
+        self._channels_lock = threading.Lock()
+
+    def connect(self):
+        """建立到服务器的SSH连接。"""
+        if self.pool:
+            self.client, err = self.pool.acquire(self.hostname, self.port, self.username,
+                                                 self.password, self.key_filename)
+            if err:
+                return False, err
+            return True, "成功连接到服务器。"
+        try:
+            self.client = paramiko.SSHClient()
+            self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy()) # 自动添加主机密钥
+            if self.key_filename:
+                # 使用密钥文件进行连接
+                self.client.connect(hostname=self.hostname, port=self.port,
+                                    username=self.username, key_filename=self.key_filename)
+            else:
+                # 使用密码进行连接
+                self.client.connect(hostname=self.hostname, port=self.port,
+                                    username=self.username, password=self.password)
+            return True, "成功连接到服务器。"
+        except Exception as e:
+            self.client = None # 连接失败时重置客户端
+            return False, f"连接失败: {str(e)}"
+
+    def _execute_command(self, command):
+        """在远程服务器上执行命令。
+
+        Args:
+            command (str): 要执行的命令字符串。
+
+        Returns:
+            tuple: (str or None, str or None) 第一个元素是命令的标准输出，第二个是错误信息。
+                   如果命令执行成功但有非致命的stderr输出（如tty警告），错误信息可能为None。
+                   超时或被取消时输出为None，错误信息说明原因；需要区分时使用 run_command。
+        """
+        result = self.run_command(command)
+        if result.error:
+            return None, result.error
+        error = result.stderr.strip()
+        if self._is_fatal_error(error):
+            return None, error # 返回真正的错误信息
+        return result.stdout.strip(), None # 如果只有非致命错误，视作成功
+
+    def run_command(self, command, timeout=None, on_output=None, stop_event=None):
+        """在远程服务器上执行命令，在截止时间内同时读取标准输出和标准错误。
+
+        两路输出在同一循环中交替读取，任何一路的缓冲区写满都不会让远端阻塞；
+        超过截止时间或调用 cancel() 时关闭通道，并返回带有 timed_out / cancelled 标记的结果。
+
+        Args:
+            command (str): 要执行的命令字符串。
+            timeout (float, optional): 本次命令的超时（秒），0表示不限制。默认为None（使用 command_timeout）。
+            on_output (callable, optional): 提供时标准输出按到达顺序以文本块交给它处理，不在结果中累积。默认为None。
+            stop_event (threading.Event, optional): 设置后像 cancel() 一样结束本次命令。默认为None。
+
+        Returns:
+            CommandResult: 命令的输出、退出码及是否超时或被取消。
+        """
+        if not self.client:
+            return CommandResult(error="未连接到服务器。")
+        if self._cancel_event.is_set():
+            return CommandResult(cancelled=True, error="命令已取消。")
+        timeout = self.command_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout if timeout else None
+        try:
+            stdin, stdout, stderr = self._exec(command)
+        except Exception as e:
+            return CommandResult(error=f"命令执行失败: {str(e)}")
+        channel = stdout.channel
+        with self._channels_lock:
+            self._channels.add(channel)
+        out_chunks = []
+        err_chunks = []
+        utf8 = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        result = CommandResult()
+        try:
+            channel.shutdown_write() # 不向远程命令提供标准输入
+            while True:
+                while channel.recv_ready():
+                    if on_output:
+                        on_output(utf8.decode(channel.recv(65536)))
+                    else:
+                        out_chunks.append(channel.recv(65536))
+                while channel.recv_stderr_ready():
+                    err_chunks.append(channel.recv_stderr(65536))
+                if channel.exit_status_ready() and not channel.recv_ready() and not channel.recv_stderr_ready():
+                    result.exit_status = channel.recv_exit_status()
+                    if on_output:
+                        tail = utf8.decode(b"", final=True)
+                        if tail:
+                            on_output(tail)
+                    break
+                # 先于 closed 检查：cancel() 会先置位再关闭通道
+                if self._cancel_event.is_set() or (stop_event and stop_event.is_set()):
+                    result.cancelled = True
+                    result.error = "命令已取消。"
+                    break
+                if channel.closed:
+                    break
+                remaining = deadline - time.monotonic() if deadline else 0.5
+                if remaining <= 0:
+                    result.timed_out = True
+                    result.error = f"命令执行超时（超过{timeout:g}秒），已取消。"
+                    break
+                # 通道的 fileno 在两路输出有数据或通道关闭时变为可读；定期醒来检查取消请求
+                select.select([channel], [], [], min(remaining, 0.5))
+        except Exception as e:
+            result.error = f"命令执行失败: {str(e)}"
+        finally:
+            channel.close()
+            with self._channels_lock:
+                self._channels.discard(channel)
+        result.stdout = b"".join(out_chunks).decode(errors="replace")
+        result.stderr = b"".join(err_chunks).decode(errors="replace")
+        return result
+
+    def cancel(self):
+        """取消正在执行和之后的所有命令：关闭进行中的通道，run_command 立即返回 cancelled 结果。"""
+        self._cancel_event.set()
+        with self._channels_lock:
+            channels = list(self._channels)
+        for channel in channels:
+            try:
+                channel.close()
+            except Exception:
+                pass
+
+    def _exec(self, command):
+        """打开通道执行命令，返回 (stdin, stdout, stderr)。使用连接池时，连接失效会重连一次。"""
+        try:
+            return self.client.exec_command(command)
+        except Exception:
+            if not self.pool:
+                raise
+            # 池中的连接可能已被服务器断开，丢弃后重连一次再重试
+            self.pool.invalidate(self.hostname, self.port, self.username)
+            connected, msg = self.connect()
+            if not connected:
+                raise RuntimeError(msg)
+            return self.client.exec_command(command)
+
+    @staticmethod
+    def _is_fatal_error(error):
+        """判断stderr内容是否为真正的错误。"""
+        if not error:
+            return False
+        # 忽略一些常见的非致命错误信息，这些信息通常不影响命令结果的获取
+        return "stdin: is not a tty" not in error and \
+               "TERM environment variable not set" not in error and \
+               "TERM setting 'dumb' is not supported" not in error # 添加了对'dumb'终端错误的处理
+
+    def _stream_command(self, command, on_line):
+        """执行命令并把标准输出逐行交给 on_line 处理，不把整个输出一次性读入内存。
+
+        经由 run_command 执行，同样受 command_timeout 限制并可被 cancel() 中止。
+
+        Args:
+            command (str): 要执行的命令字符串。
+            on_line (callable): 每读到一行（已去掉换行符）调用一次。
+
+        Returns:
+            str or None: 错误信息，成功时为None。
+        """
+        pending = [""] # 尚未遇到换行符的最后一段
+
+        def on_output(text):
+            *lines, pending[0] = (pending[0] + text).split("\n")
+            for line in lines:
+                on_line(line.rstrip("\r"))
+
+        result = self.run_command(command, on_output=on_output)
+        if result.error:
+            return result.error
+        if pending[0]:
+            on_line(pending[0].rstrip("\r"))
+        error = result.stderr.strip()
+        return error if self._is_fatal_error(error) else None
+
+    def get_cpu_usage(self):
+        """获取CPU使用率（显示文本）。结构化结果见 get_resource_snapshot。"""
+        return self._get_metric_text("cpu")
+
+    def get_memory_usage(self):
+        """获取内存使用情况（显示文本）。"""
+        return self._get_metric_text("memory")
+
+    def get_disk_usage(self):
+        """获取所有实际文件系统的容量和inode使用情况（显示文本）。"""
+        return self._get_metric_text("disk")
+
+    def get_load_average(self):
+        """获取系统平均负载（显示文本）。"""
+        return self._get_metric_text("load")
+
+    def get_uptime(self):
+        """获取服务器运行时间（显示文本）。"""
+        return self._get_metric_text("uptime")
+
+    def _get_metric_text(self, section):
+        """单独采集一项指标并格式化为显示文本。"""
+        output, err = self._execute_command(METRIC_COMMANDS[section])
+        snapshot = self._snapshot_from_sections({section: output} if not err else {},
+                                                {section: err} if err else {})
+        return METRIC_FORMATTERS[section](snapshot)
+
+    def _sample_cpu_usage(self, output):
+        """根据 /proc/stat 汇总行计算CPU使用率，并更新该主机的快照。
+
+        Args:
+            output (str): "cpu  user nice system idle iowait irq softirq steal ..." 形式的一行文本。
+
+        Returns:
+            CpuUsage or None: 首次采样返回开机以来的平均值（since_boot=True）；无法解析时返回None。
+        """
+        fields = output.split() if output else []
+        if len(fields) < 5 or fields[0] != "cpu":
+            return None
+        try:
+            counters = [int(v) for v in fields[1:9]] # guest/guest_nice 已计入 user/nice，不重复累加
+        except ValueError:
+            return None
+        idle = counters[3] + (counters[4] if len(counters) > 4 else 0) # idle + iowait
+        total = sum(counters)
+        busy = total - idle
+
+        key = (self.hostname, self.port)
+        with _cpu_snapshots_lock:
+            previous = _cpu_snapshots.get(key)
+            if previous is not None and total == previous[1]:
+                # 两次采样之间计数尚未前进（轮询间隔小于一个时钟节拍），沿用上一次的结果
+                return previous[2]
+            if previous is None or total < previous[1]:
+                # 首次采样（或主机重启导致计数回绕）：直接使用开机以来的累计值
+                usage = CpuUsage(busy / total * 100, since_boot=True) if total else None
+            else:
+                usage = CpuUsage(max(0.0, min(100.0, (busy - previous[0]) / (total - previous[1]) * 100)))
+            _cpu_snapshots[key] = (busy, total, usage)
+        return usage
+
+    def prime_cpu_sample(self):
+        """本进程尚未采样过该主机的CPU时，先读取一次 /proc/stat 计数作为基准。
+
+        单次运行的进程（如 cron 中的命令行）没有上一次的计数，第一次计算只能得到开机以来的平均值；
+        先取基准、间隔片刻再正式采集，得到的就是这段时间内的实际使用率。
+
+        Returns:
+            bool: 是否新取了基准（调用方应等待一个采样窗口后再采集）。
+        """
+        with _cpu_snapshots_lock:
+            if (self.hostname, self.port) in _cpu_snapshots:
+                return False
+        output, err = self._execute_command(METRIC_COMMANDS["cpu"])
+        return not err and self._sample_cpu_usage(output) is not None
+
+    @staticmethod
+    def _parse_memory(output):
+        """解析 free -m 的 Mem 行："Mem: 总计 已用 空闲 ..."。"""
+        fields = output.split() if output else []
+        try:
+            return MemoryUsage(used_mb=int(fields[2]), total_mb=int(fields[1]))
+        except (IndexError, ValueError):
+            return None
+
+    @staticmethod
+    def _parse_disks(output):
+        """解析磁盘段：DISK_INODES_MARKER 之前是 df -PTk 的输出，之后是 df -PTi 的输出。
+
+        每行为 "文件系统 类型 总量 已用 可用 使用率 挂载点"，挂载点可能包含空格。
+        跳过 EXCLUDED_FS_TYPES 中的类型，同一挂载点只保留一次，按挂载点排序。
+        """
+        blocks_text, _, inodes_text = (output or "").partition(DISK_INODES_MARKER)
+        disks = {}
+        for line in blocks_text.splitlines():
+            fields = line.split()
+            if len(fields) < 7 or fields[1] in EXCLUDED_FS_TYPES:
+                continue
+            mount = " ".join(fields[6:])
+            if mount in disks:
+                continue
+            try:
+                disks[mount] = DiskUsage(mount=mount, filesystem=fields[0], size_kb=int(fields[2]),
+                                         used_kb=int(fields[3]), avail_kb=int(fields[4]),
+                                         use_percent=float(fields[5].rstrip("%")), fs_type=fields[1])
+            except ValueError:
+                continue # 表头或无法解析的行
+        for line in inodes_text.splitlines():
+            fields = line.split()
+            disk = disks.get(" ".join(fields[6:])) if len(fields) >= 7 else None
+            if disk is None or disk.inodes_total is not None:
+                continue
+            try:
+                disk.inodes_total, disk.inodes_used = int(fields[2]), int(fields[3])
+            except ValueError:
+                continue # 表头，或不支持inode统计的文件系统（显示为 "-"）
+        return [disks[mount] for mount in sorted(disks)]
+
+    @staticmethod
+    def _parse_load(output):
+        """解析 /proc/loadavg："1分钟 5分钟 15分钟 运行/总进程 最近PID"。"""
+        fields = output.split() if output else []
+        try:
+            return LoadAverage(float(fields[0]), float(fields[1]), float(fields[2]))
+        except (IndexError, ValueError):
+            return None
+
+    @staticmethod
+    def _parse_uptime(output):
+        """解析 /proc/uptime 的第一列（开机以来的秒数）。"""
+        try:
+            return float(output.split()[0])
+        except (AttributeError, IndexError, ValueError):
+            return None
+
+    def _sample_processes(self, output, top_n):
+        """解析进程快照，与该主机上一次的快照比较得到各进程的CPU使用率，并更新快照。
+
+        Args:
+            output (str): PROCESS_COMMAND 的输出。
+            top_n (int): 返回的进程数。
+
+        Returns:
+            tuple: (list, list) CPU占用最高和RSS最高的各 top_n 个 ProcessUsage，均按降序排列。
+        """
+        stats_text, _, cmdline_text = (output or "").partition(PROCESS_CMDLINE_MARKER)
+        lines = stats_text.splitlines()
+        try:
+            clock_ticks, page_size = (int(v) for v in lines[0].split()[:2])
+            uptime = float(lines[1].split()[0])
+        except (IndexError, ValueError):
+            return [], []
+
+        processes = []
+        counters = {}
+        for line in lines[2:]:
+            # 第二列是括号中的进程名，可能包含空格和括号，因此以最后一个右括号为界切分
+            head, sep, rest = line.rpartition(")")
+            fields = rest.split()
+            if not sep or len(fields) < 22:
+                continue
+            try:
+                pid = int(head.split(" (", 1)[0])
+                ticks = int(fields[11]) + int(fields[12]) # utime + stime
+                start = int(fields[19])
+                rss_kb = int(fields[21]) * page_size // 1024
+            except ValueError:
+                continue
+            counters[pid] = (start, ticks)
+            processes.append(ProcessUsage(pid, head.split(" (", 1)[-1], fields[0], 0.0, rss_kb))
+        commands = self._parse_process_commands(cmdline_text)
+        for process in processes:
+            process.command = commands.get(process.pid, "")
+
+        key = (self.hostname, self.port)
+        with _process_snapshots_lock:
+            previous_uptime, previous_counters = _process_snapshots.get(key, (None, {}))
+            _process_snapshots[key] = (uptime, counters)
+        elapsed = uptime - previous_uptime if previous_uptime is not None else 0
+        for process in processes:
+            start, ticks = counters[process.pid]
+            previous = previous_counters.get(process.pid)
+            if elapsed > 0 and previous is not None and previous[0] == start:
+                process.cpu_percent = max(0.0, (ticks - previous[1]) / clock_ticks / elapsed * 100)
+            else:
+                # 首次采样、新进程或PID被复用：使用进程启动以来的平均值
+                lifetime = uptime - start / clock_ticks
+                process.cpu_percent = ticks / clock_ticks / lifetime * 100 if lifetime > 0 else 0.0
+                process.since_start = True
+
+        # 只需要前N个，用堆选取而不是对所有进程完整排序
+        top_cpu = heapq.nlargest(top_n, processes, key=lambda process: process.cpu_percent)
+        top_memory = heapq.nlargest(top_n, processes, key=lambda process: process.rss_kb)
+        return top_cpu, top_memory
+
+    @staticmethod
+    def _parse_process_commands(output):
+        """解析 head 输出的各进程命令行，返回 {pid: 命令行}。参数之间的 NUL 替换为空格，内核线程的命令行为空。"""
+        commands = {}
+        pid = None
+        for line in (output or "").split("\n"):
+            match = PROCESS_CMDLINE_HEADER.match(line)
+            if match:
+                pid = int(match.group(1))
+                lines = commands.setdefault(pid, [])
+            elif pid is not None:
+                lines.append(line)
+        # 命令行本身也可能包含换行，统一折叠空白
+        return {pid: " ".join("\n".join(lines).replace("\0", " ").split()) for pid, lines in commands.items()}
+
+    def _snapshot_from_sections(self, sections, errors=None, top_n=0):
+        """把 {段名: 命令输出} 解析为 ResourceSnapshot。top_n 大于0且包含 processes 段时一并解析进程。"""
+        top_cpu, top_memory = (self._sample_processes(sections["processes"], top_n)
+                               if top_n > 0 and "processes" in sections else ([], []))
+        return ResourceSnapshot(
+            hostname=self.hostname,
+            port=self.port,
+            timestamp=time.time(),
+            uptime_seconds=self._parse_uptime(sections.get("uptime")),
+            cpu=self._sample_cpu_usage(sections.get("cpu")) if "cpu" in sections else None,
+            memory=self._parse_memory(sections.get("memory")),
+            disks=self._parse_disks(sections.get("disk")),
+            load=self._parse_load(sections.get("load")),
+            top_cpu=top_cpu,
+            top_memory=top_memory,
+            errors=dict(errors or {}),
+        )
+
+    def get_node_ip_map(self, force_refresh=False):
+        """通过一次 kubectl 调用获取集群中所有节点的IP（优先 InternalIP，其次 ExternalIP）。
+
+        结果按 (hostname, port) 缓存 node_ip_cache_ttl 秒，多次刷新之间不重复查询。
+
+        Args:
+            force_refresh (bool, optional): 为True时忽略缓存重新获取。默认为False。
+
+        Returns:
+            tuple: (dict, str or None) {节点名: IP} 映射与错误信息。
+        """
+        key = (self.hostname, self.port)
+        if not force_refresh and self.node_ip_cache_ttl > 0:
+            with _node_ip_cache_lock:
+                cached = _node_ip_cache.get(key)
+            if cached and time.monotonic() - cached[0] < self.node_ip_cache_ttl:
+                return cached[1], None
+
+        output, err = self._execute_command(NODE_IP_COMMAND)
+        if err:
+            return {}, err
+
+        node_ip_map = {}
+        for line in output.splitlines():
+            fields = line.split("\t")
+            if not fields[0].strip():
+                continue
+            internal_ips = fields[1].split() if len(fields) > 1 else []
+            external_ips = fields[2].split() if len(fields) > 2 else []
+            node_ip_map[fields[0].strip()] = (internal_ips or external_ips or ["N/A"])[0]
+
+        with _node_ip_cache_lock:
+            _node_ip_cache[key] = (time.monotonic(), node_ip_map)
+        return node_ip_map, None
+
+    def get_pod_info(self, namespace, pod_name_filter, projected=True):
+        """获取指定命名空间中Pod的信息，包括节点名称和节点IP，并显示所有镜像。
+
+        Args:
+            namespace (str): Kubernetes命名空间。
+            pod_name_filter (str): Pod名称需包含的子串（不区分大小写），空字符串表示不过滤。
+            projected (bool, optional): 为True时只让kubectl输出所需字段并在服务器端完成名称过滤，
+                                        逐行解析结果；为False时下载完整的JSON文档。默认为True。
+        """
+        if not self.client:
+            return "未连接到服务器。"
+        if projected:
+            return self._get_pod_info_projected(namespace, pod_name_filter)
+        
+        command = f"kubectl get pods -n {namespace} -o json"
+        # print(f"DEBUG: Executing Kubernetes command: '{command}' with pod_name_filter: '{pod_name_filter}'")
+        output, err = self._execute_command(command)
+
+        if err:
+            return self._format_pod_error(err)
+        if not output:
+            check_ns_cmd = f"kubectl get ns {namespace} --no-headers"
+            ns_out, ns_err = self._execute_command(check_ns_cmd)
+            if ns_err or not ns_out:
+                return f"无法确认命名空间 '{namespace}' 是否存在，或kubectl没有输出。"
+            return f"在命名空间 '{namespace}' 中未找到Pod，或者kubectl没有输出。"
+
+        try:
+            pod_data = json.loads(output)
+            
+            pods_to_process = []
+
+            items = pod_data.get("items")
+            if items is None and not pod_data: 
+                 return f"命名空间 '{namespace}' 可能不存在或您没有权限访问。"
+            if not isinstance(items, list): 
+                 return f"获取Pod信息时返回了意外的数据结构 (items不是列表)。"
+            if not items: 
+                return f"命名空间 '{namespace}' 中没有Pod。"
+
+            for item in items:
+                pod_name = item.get("metadata", {}).get("name", "N/A")
+                
+                # Pod 名称筛选 (如果提供了过滤器)
+                if pod_name_filter and (pod_name_filter.lower() not in pod_name.lower()):
+                    continue
+
+                # 不需要再特别筛选java_images，直接将收集到的信息加入
+                pods_to_process.append(pod_record_from_json(item))
+
+            if not pods_to_process: # 如果经过名称过滤后没有Pod了
+                if pod_name_filter:
+                    return f"在命名空间 '{namespace}' 中，名称包含 '{pod_name_filter}' 的Pod未找到。"
+                else: # 如果没有名称过滤器，但列表仍为空，说明命名空间本身可能就没有Pod
+                    return f"在命名空间 '{namespace}' 中未找到任何Pod。"
+
+
+            return self._render_pod_details(pods_to_process)
+
+        except json.JSONDecodeError:
+            return f"解析Pod列表JSON失败 (非JSON输出): {output[:200]}... 请确保kubectl已正确配置并有权限。"
+        except Exception as e: 
+            import traceback 
+            print(f"DEBUG: Unexpected error in get_pod_info: {str(e)}")
+            print(f"DEBUG: Traceback: {traceback.format_exc()}")
+            return f"处理Pod信息时发生意外错误: {str(e)}"
+
+    def watch_pods(self, namespace, on_event, stop_event, on_list=None):
+        """以 list + watch 的方式持续监视命名空间中的Pod，直到 stop_event 被设置或出错。
+
+        先用一次 list 取得全部Pod及其 resourceVersion，再从该版本开始 watch，两者之间不会漏掉事件。
+        API server 会定期关闭 watch 连接（通常几分钟到一小时），版本过旧时还会返回 410 Gone；
+        只要 stop_event 未设置，就重新 list 并 watch，不需要手动重启。
+
+        Args:
+            namespace (str): Kubernetes命名空间。
+            on_event (callable): 每个增量事件调用一次 on_event(event_type, pod_object)，
+                                 event_type 为 ADDED / MODIFIED / DELETED。
+            stop_event (threading.Event): 设置后停止监视并关闭通道。
+            on_list (callable, optional): 每次（重新）list 后以全部Pod对象的列表调用一次，
+                                          调用方据此重建索引、删除监视中断期间消失的Pod。
+                                          默认为None，此时每个Pod作为 ADDED 事件交给 on_event。
+
+        Returns:
+            str or None: 错误信息，正常停止时为None。
+        """
+        if not self.client:
+            return "未连接到服务器。"
+        decoder = json.JSONDecoder()
+        while not stop_event.is_set():
+            output, error = self._execute_command(f"kubectl get pods -n {shlex.quote(namespace)} -o json")
+            if stop_event.is_set():
+                return None
+            if error:
+                return error
+            try:
+                pod_list = json.loads(output or "{}")
+            except ValueError:
+                return "无法解析Pod列表。"
+            items = pod_list.get("items", [])
+            if on_list:
+                on_list(items)
+            else:
+                for item in items:
+                    on_event("ADDED", item)
+
+            resource_version = pod_list.get("metadata", {}).get("resourceVersion", "")
+            path = (f"/api/v1/namespaces/{urllib.parse.quote(namespace, safe='')}/pods"
+                    f"?watch=true&resourceVersion={urllib.parse.quote(resource_version, safe='')}")
+            buffer = [""]
+            expired = [False]
+
+            def on_output(text):
+                # watch 输出是多个连续的JSON对象，逐个解出完整对象，剩余部分留待下一块数据
+                buffer[0] += text
+                while True:
+                    buffer[0] = buffer[0].lstrip()
+                    if not buffer[0]:
+                        break
+                    try:
+                        event, end = decoder.raw_decode(buffer[0])
+                    except json.JSONDecodeError:
+                        break # 对象尚不完整
+                    buffer[0] = buffer[0][end:]
+                    if event.get("type") == "ERROR":
+                        expired[0] = True # 通常是 410 Gone：版本已过旧，需要重新 list
+                    elif not expired[0]:
+                        on_event(event.get("type", ""), event.get("object", {}))
+
+            # 不设截止时间；stderr 与事件流同时读取，cancel() 和 stop_event 都能结束监视
+            result = self.run_command(f"kubectl get --raw {shlex.quote(path)}", timeout=0,
+                                      on_output=on_output, stop_event=stop_event)
+            if stop_event.is_set():
+                return None
+            if result.error:
+                return result.error
+            error = result.stderr.strip()
+            if self._is_fatal_error(error):
+                return error
+            # watch 被服务器正常关闭：稍等后重新 list + watch，避免异常情况下的空转
+            stop_event.wait(WATCH_RESTART_DELAY)
+        return None
+
+    def _get_pod_info_projected(self, namespace, pod_name_filter):
+        """投影模式：kubectl 只输出名称、状态、节点和镜像字段，名称过滤在服务器端用 awk 完成。"""
+        command = f"kubectl get pods -n {shlex.quote(namespace)} -o jsonpath='{POD_PROJECTION_JSONPATH}'"
+        if pod_name_filter:
+            # 在远程主机上先过滤再传输，只有匹配的行会经过SSH通道
+            command += f" | awk -F'\\t' -v f={shlex.quote(pod_name_filter.lower())} 'index(tolower($1), f) > 0'"
+
+        pods_to_process = []
+
+        def parse_line(line):
+            fields = line.split("\t")
+            if not fields[0]:
+                return
+            fields += [""] * (5 - len(fields))
+            pods_to_process.append({
+                "name": fields[0],
+                "status": fields[1] or "N/A",
+                "node_name": fields[2] or "N/A",
+                "images": fields[3].split() + fields[4].split(), # 普通容器在前，init容器在后
+            })
+
+        err = self._stream_command(command, parse_line)
+        if err:
+            return self._format_pod_error(err)
+        if not pods_to_process:
+            if pod_name_filter:
+                return f"在命名空间 '{namespace}' 中，名称包含 '{pod_name_filter}' 的Pod未找到。"
+            ns_out, ns_err = self._execute_command(f"kubectl get ns {shlex.quote(namespace)} --no-headers")
+            if ns_err or not ns_out:
+                return f"无法确认命名空间 '{namespace}' 是否存在，或kubectl没有输出。"
+            return f"命名空间 '{namespace}' 中没有Pod。"
+        return self._render_pod_details(pods_to_process)
+
+    @staticmethod
+    def _format_pod_error(err):
+        """格式化获取Pod列表时的错误信息。"""
+        if "command not found" in err.lower() or "not found" in err.lower() or "不存在" in err:
+            return f"获取Pod信息错误: {err}. 请确保 kubectl 已在服务器上安装并配置在PATH中。"
+        return f"获取Pod信息错误: {err}"
+
+    def _render_pod_details(self, pods_to_process):
+        """补充节点IP并把Pod列表格式化为显示文本。"""
+        node_names = {pod_info["node_name"] for pod_info in pods_to_process if pod_info["node_name"] != "N/A"}
+        node_ip_map = {}
+        if node_names: 
+            node_ip_map, node_err = self.get_node_ip_map()
+            if not node_err and not node_names.issubset(node_ip_map):
+                # 缓存中缺少某些节点（例如新加入的节点），跳过缓存重新获取一次
+                node_ip_map, node_err = self.get_node_ip_map(force_refresh=True)
+            if node_err:
+                print(f"警告: 获取节点IP信息失败: {node_err}")
+                node_ip_map = {n_name: "IP获取失败" for n_name in node_names}
+
+        pod_details = []
+        for pod_info in pods_to_process:
+            node_ip = node_ip_map.get(pod_info["node_name"], "IP未知") if pod_info["node_name"] != "N/A" else "N/A"
+            # 显示所有镜像
+            images_str = ", ".join(pod_info['images']) if pod_info['images'] else "无" # 使用 'images' 键
+            detail = (f"Pod: {pod_info['name']}\n"
+                      f"  状态: {pod_info['status']}\n"
+                      f"  镜像: {images_str}\n"  # 修改这里以显示所有镜像
+                      f"  节点: {pod_info['node_name']}\n"
+                      f"  节点IP: {node_ip}")
+            pod_details.append(detail)
+
+        if not pod_details: 
+            return "未找到符合条件的Pod（内部逻辑问题）。" 
+
+        return "\n---\n".join(pod_details)
+
+    def _build_batch_probe(self, commands=METRIC_COMMANDS):
+        """把所有指标命令拼接成一条复合命令，各段输出之前先打印分隔标记。
+
+        每段命令的 stderr 都被丢弃，单段失败只会让该段输出为空，不影响其他段。
+        标记前先输出换行，防止上一段输出没有以换行结尾时与标记粘在同一行。
+
+        Args:
+            commands (dict, optional): {段名: 命令}。默认为 METRIC_COMMANDS。
+        """
+        parts = []
+        for section, command in commands.items():
+            parts.append(f"printf '\\n{BATCH_SECTION_MARKER}{section}\\n'")
+            parts.append(f"( {command} ) 2>/dev/null")
+        return "; ".join(parts)
+
+    @staticmethod
+    def _parse_batch_output(output):
+        """按分隔标记把复合命令的输出切分为 {段名: 输出文本} 字典。"""
+        sections = {}
+        current = None
+        lines = []
+        for line in output.splitlines():
+            if line.startswith(BATCH_SECTION_MARKER):
+                if current is not None:
+                    sections[current] = "\n".join(lines).strip()
+                current = line[len(BATCH_SECTION_MARKER):].strip()
+                lines = []
+            elif current is not None:
+                lines.append(line)
+        if current is not None:
+            sections[current] = "\n".join(lines).strip()
+        return sections
+
+    def get_resource_snapshot(self, batched=True, top_n=0):
+        """采集所有资源指标，返回结构化结果。
+
+        Args:
+            batched (bool, optional): 为True时把所有指标合并为一次远程命令采集（一次往返），
+                                      失败时自动回退为逐条执行。默认为True。
+            top_n (int, optional): 大于0时同时采集进程快照，返回CPU和RSS占用最高的各 top_n 个进程。默认为0。
+
+        Returns:
+            ResourceSnapshot: 数值化的指标快照，各项指标的错误记录在 errors 中。
+        """
+        if not self.client:
+            return ResourceSnapshot(self.hostname, self.port, time.time(),
+                                    errors={"connection": "未连接。请先连接服务器。"})
+        commands = dict(METRIC_COMMANDS, processes=PROCESS_COMMAND) if top_n > 0 else METRIC_COMMANDS
+        snapshot = None
+        if batched:
+            result = self.run_command(self._build_batch_probe(commands))
+            if result.timed_out or result.cancelled:
+                # 不再回退为逐条执行，避免一台挂起的主机占用数倍的超时时间
+                return ResourceSnapshot(self.hostname, self.port, time.time(), errors={"command": result.error},
+                                        timed_out=result.timed_out)
+            if not result.error and result.stdout.strip():
+                snapshot = self._snapshot_from_sections(self._parse_batch_output(result.stdout), top_n=top_n)
+
+        if snapshot is None:
+            sections = {}
+            errors = {}
+            for section, command in commands.items():
+                # 逐条执行时各段分别计时，某一段超时（如 df 卡在NFS上）不影响其他段
+                output, err = self._execute_command(command)
+                if err:
+                    errors[section] = err
+                else:
+                    sections[section] = output
+            snapshot = self._snapshot_from_sections(sections, errors, top_n)
+        return snapshot
+
+    def collect_metrics(self, batched=True):
+        """采集各项指标，按 [运行时间, CPU, 内存, 磁盘, 平均负载] 的顺序返回格式化文本列表。
+
+        Args:
+            batched (bool, optional): 为True时优先使用一次往返的批量采集。默认为True。
+        """
+        return format_metric_lines(self.get_resource_snapshot(batched))
+
+    def get_all_resources(self, batched=True):
+        """获取所有资源信息（显示文本）。
+
+        Args:
+            batched (bool, optional): 为True时把所有指标合并为一次远程命令采集（一次往返），
+                                      失败时自动回退为逐条执行。默认为True。
+        """
+        if not self.client:
+            return "未连接。请先连接服务器。"
+        return format_snapshot(self.get_resource_snapshot(batched))
+
+    def close(self):
+        """关闭SSH连接。使用连接池时只归还连接，保持其处于热状态。"""
+        if self.client and self.pool:
+            self.pool.release(self.hostname, self.port, self.username, self.client)
+            self.client = None
+        elif self.client:
+            self.client.close()
+            self.client = None
+            print("连接已关闭。")
+
+
+def _human_size(kb):
+    """把KB数格式化为类似 df -h 的易读大小。"""
+    value = float(kb)
+    for unit in "KMGTP":
+        if value < 1024 or unit == "P":
+            break
+        value /= 1024
+    return f"{value:.1f}{unit}" if value < 10 else f"{value:.0f}{unit}"
+
+
+def _format_uptime(snapshot):
+    if "uptime" in snapshot.errors:
+        return f"运行时间错误: {snapshot.errors['uptime']}"
+    if snapshot.uptime_seconds is None:
+        return "运行时间: 不可用"
+    minutes = int(snapshot.uptime_seconds // 60)
+    days, minutes = divmod(minutes, 24 * 60)
+    hours, minutes = divmod(minutes, 60)
+    parts = [f"{days}天"] if days else []
+    if days or hours:
+        parts.append(f"{hours}小时")
+    parts.append(f"{minutes}分钟")
+    return f"运行时间: {' '.join(parts)}"
+
+
+def _format_cpu(snapshot):
+    if "cpu" in snapshot.errors:
+        return f"CPU错误: {snapshot.errors['cpu']}"
+    if snapshot.cpu is None:
+        return "CPU使用率: 不可用"
+    if snapshot.cpu.since_boot:
+        return f"CPU使用率: {snapshot.cpu.percent:.1f}% (开机以来平均)"
+    return f"CPU使用率: {snapshot.cpu.percent:.1f}%"
+
+
+def _format_memory(snapshot):
+    if "memory" in snapshot.errors:
+        return f"内存错误: {snapshot.errors['memory']}"
+    memory = snapshot.memory
+    if memory is None:
+        return "内存: 不可用"
+    return f"内存: {memory.used_mb} MB / {memory.total_mb} MB ({memory.percent:.1f}%)"
+
+
+def _format_disks(snapshot):
+    if "disk" in snapshot.errors:
+        return f"磁盘: 错误: {snapshot.errors['disk']}"
+    if not snapshot.disks:
+        return "磁盘: 不可用"
+    return "\n".join(f"磁盘 ({disk.mount}): {disk.use_percent:.0f}% 已用 {_human_size(disk.size_kb)} 总计 "
+                     f"在 {disk.filesystem} [{disk.fs_type}] ({_human_size(disk.avail_kb)} 可用"
+                     + (f", inode {disk.inode_percent:.0f}% 已用)" if disk.inode_percent is not None else ")")
+                     for disk in snapshot.disks)
+
+
+def _format_load(snapshot):
+    if "load" in snapshot.errors:
+        return f"平均负载错误: {snapshot.errors['load']}"
+    if snapshot.load is None:
+        return "平均负载: 不可用"
+    return f"平均负载: {snapshot.load.load1:.2f}, {snapshot.load.load5:.2f}, {snapshot.load.load15:.2f}"
+
+
+# 各段指标的格式化函数，顺序即显示顺序
+METRIC_FORMATTERS = {
+    "uptime": _format_uptime,
+    "cpu": _format_cpu,
+    "memory": _format_memory,
+    "disk": _format_disks,
+    "load": _format_load,
+}
+
+
+def format_metric_lines(snapshot):
+    """把资源快照格式化为 [运行时间, CPU, 内存, 磁盘, 平均负载] 显示文本列表。"""
+    return [formatter(snapshot) for formatter in METRIC_FORMATTERS.values()]
+
+
+def _format_process(process, total_mb):
+    cpu = f"{process.cpu_percent:5.1f}%" + ("*" if process.since_start else " ")
+    memory = f"{process.rss_kb / 1024 / total_mb * 100:4.1f}%" if total_mb else "    -"
+    return (f"  {process.pid:>7}  CPU {cpu}  RSS {_human_size(process.rss_kb):>5} ({memory})  "
+            f"{process.command or '[' + process.name + ']'}")
+
+
+def format_top_processes(snapshot):
+    """把进程Top N格式化为显示文本行，未采集进程时返回空列表。"""
+    total_mb = snapshot.memory.total_mb if snapshot.memory else 0
+    lines = []
+    if "processes" in snapshot.errors:
+        lines.append(f"进程错误: {snapshot.errors['processes']}")
+    if snapshot.top_cpu:
+        lines.append("CPU占用最高的进程 (*为启动以来平均):")
+        lines.extend(_format_process(process, total_mb) for process in snapshot.top_cpu)
+    if snapshot.top_memory:
+        lines.append("内存占用最高的进程:")
+        lines.extend(_format_process(process, total_mb) for process in snapshot.top_memory)
+    return lines
+
+
+def format_snapshot(snapshot):
+    """把资源快照格式化为完整的多行显示文本。"""
+    if "connection" in snapshot.errors:
+        return snapshot.errors["connection"]
+    if "command" in snapshot.errors:
+        return f"服务器: {snapshot.hostname}:{snapshot.port}\n错误: {snapshot.errors['command']}"
+    resources = [
+        f"服务器: {snapshot.hostname}:{snapshot.port}",
+        "---------------------------------",
+        *format_metric_lines(snapshot),
+        "---------------------------------"
+    ]
+    process_lines = format_top_processes(snapshot)
+    if process_lines:
+        resources.extend([*process_lines, "---------------------------------"])
+    return "\n".join(resources)
+
+
+class RemoteAgent:
+    """推送到目标主机的轻量采集代理。
+
+    代理脚本通过SFTP上传并在一个通道上启动一次，之后按固定间隔输出NDJSON快照，
+    本地只需逐行读取，不再每次轮询都新开通道、在目标主机上启动管道。
+    """
+    def __init__(self, monitor, interval=1):
+        """初始化采集代理。
+
+        Args:
+            monitor (ServerResourceMonitor): 已连接的监视器实例，负责连接与解析。
+            interval (int, optional): 采集间隔（秒）。默认为1。
+        """
+        self.monitor = monitor
+        self.interval = interval
+        self.channel = None
+
+    def start(self):
+        """上传并启动代理脚本。
+
+        Returns:
+            tuple: (bool, str) 是否成功，以及提示信息。
+        """
+        if not self.monitor.client:
+            return False, "未连接到服务器。"
+        remote_path = f"/tmp/srm_agent_{uuid.uuid4().hex}.sh"
+        try:
+            sftp = self.monitor.client.open_sftp()
+            try:
+                with sftp.open(remote_path, "w") as f:
+                    f.write(AGENT_SCRIPT)
+            finally:
+                sftp.close()
+            stdin, stdout, stderr = self.monitor._exec(f"sh {remote_path} {int(self.interval)}")
+        except Exception as e:
+            return False, f"启动采集代理失败: {str(e)}"
+        self.channel = stdout.channel
+        return True, "采集代理已启动。"
+
+    def snapshots(self, stop_event):
+        """逐个产出代理推送的资源快照，直到 stop_event 被设置或代理退出。"""
+        self.channel.settimeout(1.0) # 定期醒来检查 stop_event
+        buffer = b""
+        while not stop_event.is_set():
+            try:
+                chunk = self.channel.recv(65536)
+            except socket.timeout:
+                continue
+            if not chunk: # 代理已退出
+                return
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                try:
+                    sections = json.loads(line.decode())
+                except (UnicodeDecodeError, json.JSONDecodeError):
+                    continue # 跳过残缺的行
+                yield self.monitor._snapshot_from_sections(sections)
+
+    def stop(self):
+        """关闭通道。代理在下一次输出时收到 SIGPIPE 并自行退出。"""
+        if self.channel:
+            self.channel.close()
+            self.channel = None
+
+
+def fleet_cells(snapshot):
+    """把资源快照格式化为批量监控表格中的紧凑单元格文本，顺序同 format_metric_lines。"""
+    return [
+        _format_uptime(snapshot).split(": ", 1)[-1],
+        f"{snapshot.cpu.percent:.1f}%" if snapshot.cpu else "不可用",
+        f"{snapshot.memory.percent:.1f}%" if snapshot.memory else "不可用",
+        ", ".join(f"{disk.mount} {disk.use_percent:.0f}%" for disk in snapshot.disks) or "不可用",
+        f"{snapshot.load.load1:.2f}" if snapshot.load else "不可用",
+    ]
+
+
+def load_inventory(path):
+    """从JSON清单文件加载主机列表。
+
+    文件内容为主机对象数组，字段与 ServerMonitorGUI.presets 相同：
+    name（可选）、hostname、port（可选，默认22）、username、password（可选）、key_filename（可选）。
+
+    Args:
+        path (str): 清单文件路径。
+
+    Returns:
+        list: 规范化后的主机字典列表。
+
+    Raises:
+        ValueError: 文件内容不是主机对象数组，缺少必填字段，或端口号无效。
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, list):
+        raise ValueError("清单文件必须是主机对象数组。")
+    hosts = []
+    for index, item in enumerate(data):
+        if not isinstance(item, dict) or not item.get("hostname") or not item.get("username"):
+            raise ValueError(f"第 {index + 1} 个主机缺少 hostname 或 username。")
+        # 省略或为 null 时使用22；显式的0、超出范围或不是数字的端口与图形界面一样视为无效
+        raw_port = item.get("port")
+        try:
+            port = 22 if raw_port is None else int(raw_port)
+        except (TypeError, ValueError):
+            port = 0
+        if isinstance(raw_port, bool) or not 0 < port < 65536:
+            raise ValueError(f"第 {index + 1} 个主机的 port 不是有效的端口号：{raw_port!r}。")
+        hosts.append({
+            "name": item.get("name") or item["hostname"],
+            "hostname": item["hostname"],
+            "port": port,
+            "username": item["username"],
+            "password": item.get("password"),
+            "key_filename": item.get("key_filename"),
+        })
+    return hosts
+
+
+def build_hosts(inventory=None, hostname=None, port=22, username=None, password_env="SRM_PASSWORD",
+                key_filename=None):
+    """构造要采集的主机列表：提供清单文件时从清单加载，否则为单台主机。命令行工具与导出器共用。
+
+    Args:
+        inventory (str, optional): JSON主机清单文件路径，格式见 load_inventory。默认为None。
+        hostname (str, optional): 单台主机的主机名或IP。默认为None。
+        port (int, optional): 单台主机的SSH端口。默认为22。
+        username (str, optional): 单台主机的SSH用户名。默认为None。
+        password_env (str, optional): 读取单台主机密码的环境变量名。默认为 "SRM_PASSWORD"。
+        key_filename (str, optional): 单台主机的SSH私钥文件路径。默认为None。
+
+    Returns:
+        list: 规范化后的主机字典列表。
+
+    Raises:
+        ValueError: 清单文件内容无效，见 load_inventory。
+    """
+    if inventory:
+        return load_inventory(inventory)
+    return [{
+        "name": hostname,
+        "hostname": hostname,
+        "port": port,
+        "username": username,
+        "password": os.environ.get(password_env),
+        "key_filename": key_filename,
+    }]
+
+
+def poll_host(host, pool=None, batched=True, top_n=0, command_timeout=DEFAULT_COMMAND_TIMEOUT, cpu_window=0):
+    """连接单台主机并采集资源指标，供批量监控使用。
+
+    Args:
+        host (dict): 主机信息，字段同 load_inventory 的返回值。
+        pool (SSHConnectionPool, optional): 连接池。默认为None（每次新建连接）。
+        batched (bool, optional): 是否使用批量采集。默认为True。
+        top_n (int, optional): 同时采集的进程Top N，0表示不采集。默认为0。
+        command_timeout (float, optional): 单条命令的超时（秒）。默认为DEFAULT_COMMAND_TIMEOUT。
+        cpu_window (float, optional): 大于0时，若尚无该主机的CPU基准，先取基准并等待这么多秒再采集，
+                                      避免单次运行只得到开机以来的平均CPU使用率。默认为0。
+
+    Returns:
+        tuple: (bool, ResourceSnapshot or str) 成功时为资源快照，连接失败或采集超时时为错误信息。
+    """
+    monitor = ServerResourceMonitor(host["hostname"], host["username"], host.get("password"),
+                                    int(host.get("port", 22)), host.get("key_filename"), pool=pool,
+                                    command_timeout=command_timeout)
+    connected, msg = monitor.connect()
+    if not connected:
+        return False, msg
+    try:
+        if cpu_window > 0 and monitor.prime_cpu_sample():
+            time.sleep(cpu_window)
+        snapshot = monitor.get_resource_snapshot(batched, top_n)
+        if snapshot.timed_out:
+            return False, snapshot.errors["command"]
+        return True, snapshot
+    finally:
+        monitor.close()
+
+
+def pod_record_from_json(item):
+    """从Pod的JSON对象中提取显示所需的字段。"""
+    all_images = []
+    for container in item.get("spec", {}).get("containers", []): 
+        all_images.append(container.get("image", ""))
+    for init_container in item.get("spec", {}).get("initContainers", []): 
+        all_images.append(init_container.get("image", ""))
+    return {
+        "name": item.get("metadata", {}).get("name", "N/A"),
+        "status": item.get("status", {}).get("phase", "N/A"),
+        "node_name": item.get("spec", {}).get("nodeName", "N/A"),
+        "images": all_images, # 保留所有镜像信息
+    }
+
+
+class PodIndex:
+    """按Pod名称索引的内存Pod表，把watch事件转换为行级别的变更。"""
+    def __init__(self, pod_name_filter=""):
+        """初始化Pod索引。
+
+        Args:
+            pod_name_filter (str, optional): Pod名称需包含的子串（不区分大小写）。默认为空，不过滤。
+        """
+        self.pod_name_filter = pod_name_filter.lower()
+        self.pods = {}  # {Pod名称: pod_record_from_json 返回的记录}
+
+    def apply_event(self, event_type, pod_object):
+        """应用一个watch事件。
+
+        Returns:
+            tuple or None: ("upsert" 或 "delete", Pod名称, 记录)；事件不影响显示内容时返回None。
+        """
+        record = pod_record_from_json(pod_object)
+        name = record["name"]
+        if self.pod_name_filter and self.pod_name_filter not in name.lower():
+            return None
+        if event_type == "DELETED":
+            if self.pods.pop(name, None) is None:
+                return None
+            return "delete", name, record
+        if event_type in ("ADDED", "MODIFIED"):
+            if self.pods.get(name) == record: # 只有显示字段之外的内容变化（如注解），无需重绘
+                return None
+            self.pods[name] = record
+            return "upsert", name, record
+        return None
+
+    def reset(self, pod_objects):
+        """用一次完整的Pod列表重建索引（监视重新建立时），返回与旧索引相比的变更。
+
+        Returns:
+            list: [("upsert" 或 "delete", Pod名称, 记录)]，列表中没有的Pod作为 delete 返回。
+        """
+        pods = {}
+        for pod_object in pod_objects:
+            record = pod_record_from_json(pod_object)
+            if not self.pod_name_filter or self.pod_name_filter in record["name"].lower():
+                pods[record["name"]] = record
+        changes = [("delete", name, record) for name, record in self.pods.items() if name not in pods]
+        changes += [("upsert", name, record) for name, record in pods.items() if self.pods.get(name) != record]
+        self.pods = pods
+        return changes
+
+
+class MetricRingBuffer:
+    """定长、基于 array 的环形缓冲区，写满后覆盖最旧的数据，内存占用固定。"""
+    __slots__ = ("capacity", "_data", "_next", "_count")
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._data = array("d", [math.nan]) * capacity
+        self._next = 0  # 下一个写入位置
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, value):
+        """追加一个数据点，缺失值用 NaN 表示。"""
+        self._data[self._next] = value
+        self._next = (self._next + 1) % self.capacity
+        if self._count < self.capacity:
+            self._count += 1
+
+    def values(self):
+        """按时间先后返回缓冲区中的全部数据点。"""
+        if self._count < self.capacity:
+            return self._data[:self._count].tolist()
+        return (self._data[self._next:] + self._data[:self._next]).tolist()
+
+
+class MetricHistory:
+    """按 (主机, 指标) 保存历史数据的环形缓冲区集合，总内存只与主机数和容量有关。"""
+    def __init__(self, capacity=HISTORY_CAPACITY):
+        """初始化指标历史。
+
+        Args:
+            capacity (int, optional): 每个 (主机, 指标) 保留的采样点数。默认为HISTORY_CAPACITY。
+        """
+        self.capacity = capacity
+        self._buffers = {}  # {(主机, 指标): MetricRingBuffer}
+
+    def record(self, host, sample):
+        """记录一次采样，未采集到的指标记为 NaN，保持各指标时间轴对齐。"""
+        for metric, _, _ in HISTORY_METRICS:
+            buffer = self._buffers.get((host, metric))
+            if buffer is None:
+                buffer = self._buffers[(host, metric)] = MetricRingBuffer(self.capacity)
+            buffer.append(sample.get(metric, math.nan))
+
+    def series(self, host, metric):
+        """返回某主机某指标的历史数据（按时间先后）。"""
+        buffer = self._buffers.get((host, metric))
+        return buffer.values() if buffer else []
+
+    def render(self, host, width=SPARKLINE_WIDTH):
+        """把某主机所有指标的历史渲染为多行迷你趋势图文本。"""
+        lines = []
+        for metric, label, upper in HISTORY_METRICS:
+            values = self.series(host, metric)
+            valid = [v for v in values if not math.isnan(v)]
+            if not valid:
+                lines.append(f"{label:<6}(无数据)")
+                continue
+            lines.append(f"{label:<6}{render_sparkline(values, width, 0.0, upper)}  "
+                         f"当前 {valid[-1]:.1f}  最小 {min(valid):.1f}  最大 {max(valid):.1f}  ({len(values)} 个采样)")
+        return "\n".join(lines)
+
+
+def render_sparkline(values, width=SPARKLINE_WIDTH, lower=0.0, upper=None):
+    """把数值序列渲染为由方块字符组成的迷你趋势图。
+
+    数据点多于 width 时按桶取平均降采样；NaN 显示为空格。
+
+    Args:
+        values (list): 数值序列。
+        width (int, optional): 最多输出的字符数。默认为SPARKLINE_WIDTH。
+        lower (float, optional): 纵轴下限。默认为0。
+        upper (float, optional): 纵轴上限，None 表示取序列最大值（用于没有固定上限的指标，如负载）。
+    """
+    if len(values) > width:
+        bucket = len(values) / width
+        buckets = [values[int(i * bucket):int((i + 1) * bucket)] for i in range(width)]
+        values = []
+        for chunk in buckets:
+            valid = [v for v in chunk if not math.isnan(v)]
+            values.append(sum(valid) / len(valid) if valid else math.nan)
+    valid = [v for v in values if not math.isnan(v)]
+    if upper is None:
+        upper = max(valid, default=0.0)
+    span = upper - lower
+    chars = []
+    for value in values:
+        if math.isnan(value):
+            chars.append(" ")
+            continue
+        level = 0 if span <= 0 else int((min(max(value, lower), upper) - lower) / span * (len(SPARKLINE_CHARS) - 1))
+        chars.append(SPARKLINE_CHARS[level])
+    return "".join(chars)
+
+
+@dataclass
+class AlertRule:
+    """阈值告警规则。
+
+    metric 为 metric_values 中的键（如 "cpu"、"disk:/"），以 ":*" 结尾时匹配该前缀下的所有键
+    （如 "pod_phase:*" 对每个Pod分别判断）。条件连续满足 for_samples 个样本才触发。
+    """
+    name: str
+    metric: str
+    op: str  # ">", ">=", "<", "<=", "==", "!="
+    threshold: object
+    for_samples: int = 1
+
+    def matches(self, key):
+        if self.metric.endswith(":*"):
+            return key.startswith(self.metric[:-1])
+        return key == self.metric
+
+
+@dataclass
+class AlertEvent:
+    """告警状态变化事件，只在触发和恢复时各产生一次。"""
+    rule: str
+    host: str
+    subject: str  # 触发规则的指标键，如 "cpu"、"pod_phase:java-app-0"
+    state: str  # "firing" 或 "resolved"
+    value: object
+    timestamp: float
+
+    def __str__(self):
+        label = "告警" if self.state == "firing" else "恢复"
+        when = time.strftime("%H:%M:%S", time.localtime(self.timestamp))
+        if self.value is None:
+            value = "已删除"
+        elif isinstance(self.value, float):
+            value = f"{self.value:.1f}"
+        else:
+            value = self.value
+        return f"[{when}] [{label}] {self.host} {self.rule} ({self.subject} = {value})"
+
+
+ALERT_OPERATORS = {">": operator.gt, ">=": operator.ge, "<": operator.lt,
+                   "<=": operator.le, "==": operator.eq, "!=": operator.ne}
+
+DEFAULT_ALERT_RULES = [
+    AlertRule("CPU使用率超过90%", "cpu", ">", 90.0, for_samples=3),
+    AlertRule("内存使用率超过90%", "memory", ">", 90.0, for_samples=3),
+    AlertRule("磁盘使用率超过85%", "disk:*", ">", 85.0),
+    AlertRule("inode使用率超过90%", "inodes:*", ">", 90.0),
+    AlertRule("Pod未处于Running状态", "pod_phase:*", "!=", "Running"),
+]
+
+
+class AlertEngine:
+    """增量式阈值告警引擎。
+
+    每个 (规则, 主机, 指标键) 只保存"连续满足次数"和"是否已触发"两个状态，
+    每来一个样本只需 O(1) 更新，无需回看历史；状态不变时不产生事件，从而自动去重。
+    """
+    def __init__(self, rules=None):
+        """初始化告警引擎。
+
+        Args:
+            rules (list, optional): AlertRule 列表。默认为 DEFAULT_ALERT_RULES。
+        """
+        self.rules = list(DEFAULT_ALERT_RULES if rules is None else rules)
+        self._states = {}  # {(规则名, 主机, 指标键): [连续满足次数, 是否已触发]}
+
+    def evaluate(self, host, values, timestamp=None):
+        """用一次采样更新规则状态。
+
+        Args:
+            host (str): 主机标识，如 "192.168.2.36:3622"。
+            values (dict): {指标键: 值}。值为None表示该对象已消失（如Pod被删除），视为条件不再满足。
+            timestamp (float, optional): 采样时间。默认为当前时间。
+
+        Returns:
+            list: 本次产生的 AlertEvent 列表（通常为空）。
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        events = []
+        for rule in self.rules:
+            compare = ALERT_OPERATORS[rule.op]
+            keys = [rule.metric] if not rule.metric.endswith(":*") else [k for k in values if rule.matches(k)]
+            for key in keys:
+                if key not in values:
+                    continue # 本次没有该指标的数据，保持原状态
+                value = values[key]
+                state_key = (rule.name, host, key)
+                state = self._states.setdefault(state_key, [0, False])
+                try:
+                    breached = value is not None and compare(value, rule.threshold)
+                except TypeError:
+                    breached = False
+                if breached:
+                    state[0] += 1
+                    if not state[1] and state[0] >= rule.for_samples:
+                        state[1] = True
+                        events.append(AlertEvent(rule.name, host, key, "firing", value, timestamp))
+                else:
+                    if state[1]:
+                        events.append(AlertEvent(rule.name, host, key, "resolved", value, timestamp))
+                    if value is None: # 对象已消失，释放其状态
+                        del self._states[state_key]
+                    else:
+                        state[0], state[1] = 0, False
+        return events
+
+    def firing(self):
+        """返回当前处于触发状态的 (规则名, 主机, 指标键) 列表。"""
+        return [key for key, state in self._states.items() if state[1]]
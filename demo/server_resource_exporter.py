@@ -0,0 +1,260 @@
+"""服务器资源监视器的 Prometheus 导出器。
+
+后台采集线程按固定间隔通过 SSH 连接池并发采集所有主机，并把结果预先渲染为 Prometheus 文本格式缓存起来；
+HTTP 请求 /metrics 只返回缓存内容，不会触发任何 SSH 操作，因此抓取频率和抓取方数量都不影响被监控主机的负载。
+
+    # 每15秒采集清单中的所有主机，在 9105 端口提供 /metrics
+    python server_resource_exporter.py --inventory hosts.json --interval 15 --listen 0.0.0.0:9105
+"""
+import argparse
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from server_resource_core import build_hosts, poll_host, ssh_pool
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 指标名 -> (类型, 说明)，渲染时按此顺序输出 HELP/TYPE
+METRIC_META = {
+    "srm_up": ("gauge", "最近一次采集是否成功连接到主机（1成功，0失败）"),
+    "srm_collect_duration_seconds": ("gauge", "最近一次采集该主机所用的时间"),
+    "srm_last_collect_timestamp_seconds": ("gauge", "最近一次采集完成的Unix时间戳"),
+    "srm_uptime_seconds": ("gauge", "主机运行时间"),
+    "srm_cpu_usage_percent": ("gauge", "CPU使用率（两次采样之间的平均值）"),
+    "srm_memory_used_bytes": ("gauge", "已用内存"),
+    "srm_memory_total_bytes": ("gauge", "内存总量"),
+    "srm_filesystem_size_bytes": ("gauge", "文件系统总容量"),
+    "srm_filesystem_used_bytes": ("gauge", "文件系统已用容量"),
+    "srm_filesystem_avail_bytes": ("gauge", "文件系统可用容量"),
+    "srm_filesystem_files": ("gauge", "文件系统inode总数"),
+    "srm_filesystem_files_used": ("gauge", "文件系统已用inode数"),
+    "srm_load1": ("gauge", "1分钟平均负载"),
+    "srm_load5": ("gauge", "5分钟平均负载"),
+    "srm_load15": ("gauge", "15分钟平均负载"),
+    "srm_metric_errors": ("gauge", "最近一次采集中失败的指标段（值恒为1）"),
+}
+
+
+def _escape_label(value):
+    """按 Prometheus 文本格式转义标签值。"""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    return "{" + ",".join(f'{key}="{_escape_label(value)}"' for key, value in labels.items()) + "}"
+
+
+def snapshot_samples(host, success, result, duration, collected_at):
+    """把单台主机的采集结果转换为 (指标名, 标签, 数值) 列表。
+
+    Args:
+        host (dict): 主机信息，字段同 load_inventory 的返回值。
+        success (bool): 是否采集成功。
+        result (ResourceSnapshot or str): 成功时为资源快照，失败时为错误信息。
+        duration (float): 采集耗时（秒）。
+        collected_at (float): 采集完成的Unix时间戳。
+
+    Returns:
+        list: (str, dict, float) 样本列表。
+    """
+    base = {"name": host["name"], "instance": f"{host['hostname']}:{host['port']}"}
+    samples = [
+        ("srm_up", base, 1 if success else 0),
+        ("srm_collect_duration_seconds", base, duration),
+        ("srm_last_collect_timestamp_seconds", base, collected_at),
+    ]
+    if not success:
+        return samples
+    snapshot = result
+    if snapshot.uptime_seconds is not None:
+        samples.append(("srm_uptime_seconds", base, snapshot.uptime_seconds))
+    if snapshot.cpu:
+        samples.append(("srm_cpu_usage_percent", base, snapshot.cpu.percent))
+    if snapshot.memory:
+        samples.append(("srm_memory_used_bytes", base, snapshot.memory.used_mb * 1024 * 1024))
+        samples.append(("srm_memory_total_bytes", base, snapshot.memory.total_mb * 1024 * 1024))
+    for disk in snapshot.disks:
+        labels = dict(base, mountpoint=disk.mount, device=disk.filesystem, fstype=disk.fs_type)
+        samples.append(("srm_filesystem_size_bytes", labels, disk.size_kb * 1024))
+        samples.append(("srm_filesystem_used_bytes", labels, disk.used_kb * 1024))
+        samples.append(("srm_filesystem_avail_bytes", labels, disk.avail_kb * 1024))
+        if disk.inodes_total is not None:
+            samples.append(("srm_filesystem_files", labels, disk.inodes_total))
+            samples.append(("srm_filesystem_files_used", labels, disk.inodes_used))
+    if snapshot.load:
+        samples.append(("srm_load1", base, snapshot.load.load1))
+        samples.append(("srm_load5", base, snapshot.load.load5))
+        samples.append(("srm_load15", base, snapshot.load.load15))
+    for section in snapshot.errors:
+        samples.append(("srm_metric_errors", dict(base, section=section), 1))
+    return samples
+
+
+def render_metrics(samples):
+    """把样本渲染为 Prometheus 文本格式，同名指标归为一组并只输出一次 HELP/TYPE。"""
+    grouped = {name: [] for name in METRIC_META}
+    for name, labels, value in samples:
+        grouped[name].append(f"{name}{_format_labels(labels)} {float(value)!r}")
+    lines = []
+    for name, rows in grouped.items():
+        if not rows:
+            continue
+        metric_type, help_text = METRIC_META[name]
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        lines.extend(rows)
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class MetricsCollector:
+    """后台定时采集所有主机，并缓存渲染好的 /metrics 响应。"""
+
+    def __init__(self, hosts, interval=15, workers=8, batched=True, pool=ssh_pool):
+        self.hosts = hosts
+        self.interval = interval
+        self.batched = batched
+        self.pool = pool
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers))
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        # 清单中的序号 -> 该主机最近一次的样本列表；不按主机名索引，同名的主机不会互相覆盖
+        self._samples = {}
+        self._payload = render_metrics([])
+        self._rounds = 0
+
+    @property
+    def payload(self):
+        """最近一轮采集渲染出的响应体（bytes）。"""
+        with self._lock:
+            return self._payload
+
+    @property
+    def rounds(self):
+        """已完成的采集轮数，0表示首轮尚未完成。"""
+        with self._lock:
+            return self._rounds
+
+    def _collect_host(self, host):
+        started = time.monotonic()
+        try:
+            success, result = poll_host(host, self.pool, self.batched)
+        except Exception as e:
+            success, result = False, f"采集失败: {str(e)}"
+        return snapshot_samples(host, success, result, time.monotonic() - started, time.time())
+
+    def collect_once(self):
+        """并发采集一轮，完成后整体替换缓存，抓取方不会看到只更新了一半的数据。"""
+        results = list(self._executor.map(self._collect_host, self.hosts))
+        with self._lock:
+            for index, samples in enumerate(results):
+                self._samples[index] = samples
+            all_samples = [sample for samples in self._samples.values() for sample in samples]
+            self._payload = render_metrics(all_samples)
+            self._rounds += 1
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            started = time.monotonic()
+            self.collect_once()
+            # 按固定节奏采集：扣除本轮耗时
+            self._stop_event.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def start(self):
+        """启动后台采集线程。"""
+        self._thread = threading.Thread(target=self._run, name="metrics-collector", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止采集线程并释放线程池。"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+        self._executor.shutdown(wait=False)
+
+
+def make_handler(collector):
+    """创建绑定到指定采集器的请求处理类。"""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split("?", 1)[0]
+            if path == "/metrics":
+                self._reply(200, CONTENT_TYPE, collector.payload)
+            elif path == "/":
+                self._reply(200, "text/html; charset=utf-8",
+                            b'<html><body><a href="/metrics">/metrics</a></body></html>')
+            else:
+                self._reply(404, "text/plain; charset=utf-8", b"not found\n")
+
+        def _reply(self, status, content_type, body):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # 高频抓取时不逐条打印访问日志
+            pass
+
+    return MetricsHandler
+
+
+def parse_args(argv=None):
+    """解析命令行参数。"""
+    parser = argparse.ArgumentParser(description="服务器资源监视器的 Prometheus 导出器")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--inventory", help="JSON主机清单文件，格式同GUI的批量监控")
+    target.add_argument("--host", help="单台主机的主机名或IP")
+    parser.add_argument("--port", type=int, default=22, help="SSH端口，默认22")
+    parser.add_argument("--user", help="SSH用户名（使用 --host 时必填）")
+    parser.add_argument("--password-env", default="SRM_PASSWORD",
+                        help="从该环境变量读取SSH密码，默认 SRM_PASSWORD")
+    parser.add_argument("--key-file", help="SSH私钥文件路径")
+    parser.add_argument("--interval", type=float, default=15, help="后台采集间隔（秒），默认15")
+    parser.add_argument("--workers", type=int, default=8, help="并发采集的主机数，默认8")
+    parser.add_argument("--listen", default="0.0.0.0:9105", help="HTTP监听地址，默认 0.0.0.0:9105")
+    parser.add_argument("--no-batch", action="store_true", help="逐条执行指标命令，而不是合并为一次往返")
+    args = parser.parse_args(argv)
+    if args.host and not args.user:
+        parser.error("使用 --host 时必须提供 --user")
+    if args.interval <= 0:
+        parser.error("--interval 必须大于0")
+    return args
+
+
+def main(argv=None):
+    """程序入口。"""
+    args = parse_args(argv)
+    try:
+        hosts = build_hosts(args.inventory, args.host, args.port, args.user, args.password_env, args.key_file)
+    except (OSError, ValueError) as e:
+        print(f"无法加载主机清单: {str(e)}", file=sys.stderr)
+        return 2
+    address, _, port = args.listen.rpartition(":")
+
+    collector = MetricsCollector(hosts, args.interval, args.workers, not args.no_batch)
+    server = ThreadingHTTPServer((address or "0.0.0.0", int(port)), make_handler(collector))
+    server.daemon_threads = True
+    # SIGTERM 时在另一个线程中关闭服务器（shutdown 不能在 serve_forever 所在线程中调用）
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+    collector.start()
+    print(f"正在监听 http://{args.listen}/metrics ，共 {len(hosts)} 台主机", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        collector.stop()
+        ssh_pool.close_all()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
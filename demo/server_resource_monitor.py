@@ -1,319 +1,42 @@
 import sys
-import paramiko
-import json # 添加json模块导入
-# 移除了未使用的 re 模块导入
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                              QHBoxLayout, QLabel, QLineEdit, QPushButton,
                              QTextEdit, QMessageBox, QGroupBox, QComboBox,
-                             QTabWidget) # 确保 QTabWidget 也已导入
-from PyQt6.QtCore import QThread, pyqtSignal
-
-class ServerResourceMonitor:
-    """处理SSH连接并获取服务器资源信息。"""
-    def __init__(self, hostname, username, password=None, port=22, key_filename=None):
-        """初始化服务器资源监视器。
-
-        Args:
-            hostname (str): 服务器的主机名或IP地址。
-            username (str): SSH登录用户名。
-            password (str, optional): SSH登录密码。默认为None。
-            port (int, optional): SSH端口。默认为22。
-            key_filename (str, optional): SSH私钥文件路径。默认为None。
-        """
-        self.hostname = hostname
-        self.port = port
-        self.username = username
-        self.password = password
-        self.key_filename = key_filename  # SSH密钥文件，暂未在UI中实现输入
-        self.client = None  # paramiko SSH客户端实例
-
-    def connect(self):
-        """建立到服务器的SSH连接。"""
-        try:
-            self.client = paramiko.SSHClient()
-            self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy()) # 自动添加主机密钥
-            if self.key_filename:
-                # 使用密钥文件进行连接
-                self.client.connect(hostname=self.hostname, port=self.port,
-                                    username=self.username, key_filename=self.key_filename)
-            else:
-                # 使用密码进行连接
-                self.client.connect(hostname=self.hostname, port=self.port,
-                                    username=self.username, password=self.password)
-            return True, "成功连接到服务器。"
-        except Exception as e:
-            self.client = None # 连接失败时重置客户端
-            return False, f"连接失败: {str(e)}"
-
-    def _execute_command(self, command):
-        """在远程服务器上执行命令。
-
-        Args:
-            command (str): 要执行的命令字符串。
-
-        Returns:
-            tuple: (str or None, str or None) 第一个元素是命令的标准输出，第二个是错误信息。
-                   如果命令执行成功但有非致命的stderr输出（如tty警告），错误信息可能为None。
-        """
-        if not self.client:
-            return None, "未连接到服务器。"
-        try:
-            stdin, stdout, stderr = self.client.exec_command(command)
-            output = stdout.read().decode().strip()  # 读取并解码标准输出
-            error = stderr.read().decode().strip()   # 读取并解码标准错误
-            if error:
-                # 忽略一些常见的非致命错误信息，这些信息通常不影响命令结果的获取
-                if "stdin: is not a tty" not in error and \
-                   "TERM environment variable not set" not in error and \
-                   "TERM setting 'dumb' is not supported" not in error: # 添加了对'dumb'终端错误的处理
-                    return None, error # 返回真正的错误信息
-            return output, None # 如果只有非致命错误，视作成功
-        except Exception as e:
-            return None, f"命令执行失败: {str(e)}"
-
-    def get_cpu_usage(self):
-        """获取CPU使用率。"""
-        # vmstat的输出中，第15列是空闲CPU百分比，因此 100 - 空闲百分比 = CPU使用率。
-        # vmstat 1 2 表示每秒采样一次，共采样两次，取第二次的稳定数据。
-        output, err = self._execute_command("vmstat 1 2 | tail -1 | awk '{print 100 - $15}'")
-        if err:
-            return f"CPU错误: {err}"
-        if output:
-            return f"CPU使用率: {output}%"
-        return "CPU使用率: 不可用"
-    
-    def get_memory_usage(self):
-        """获取内存使用情况。"""
-        # free -m 以MB为单位显示内存信息。
-        # awk 用于格式化输出：已用MB / 总计MB (百分比%)
-        # 修正 awk 命令中的引号问题
-        command = "free -m | grep Mem | awk '{printf \"%s MB / %s MB (%.1f%%)\", $3, $2, $3/$2*100}'"
-        output, err = self._execute_command(command)
-        if err:
-            return f"内存错误: {err}"
-        if output:
-            return f"内存: {output}"
-        return "内存: 不可用"
-
-    def get_disk_usage(self):
-        """获取磁盘使用情况（/ 和 /home，如果存在）。"""
-        lines = []
-        # 获取根文件系统 (/) 的使用情况
-        # df -hP 使用易读格式并按POSIX标准输出，tail -n1取最后一行（数据行），awk格式化
-        output_root, err_root = self._execute_command("df -hP / | tail -n1 | awk '{print $5 \" 已用 \" $2 \" 总计 在 \" $1 \" (\" $4 \" 可用)\"}'")
-        if err_root:
-            lines.append(f"磁盘 (/): 错误: {err_root}")
-        elif output_root:
-            lines.append(f"磁盘 (/): {output_root}")
-        else:
-            lines.append("磁盘 (/): 不可用")
-
-        # 检查 /home 是否为独立挂载点
-        # 通过比较 / 和 /home 的挂载点名称来判断
-        output_root_mount_point, _ = self._execute_command("df -P / | awk 'NR==2{print $6}'")
-        output_home_mount_point, _ = self._execute_command("df -P /home | awk 'NR==2{print $6}'")
-
-        # 如果 /home 存在且其挂载点与 / 不同，则获取 /home 的使用情况
-        if output_root_mount_point and output_home_mount_point and output_root_mount_point != output_home_mount_point:
-            output_home, err_home = self._execute_command("df -hP /home | tail -n1 | awk '{print $5 \" 已用 \" $2 \" 总计 在 \" $1 \" (\" $4 \" 可用)\"}'")
-            if err_home:
-                lines.append(f"磁盘 (/home): 错误: {err_home}")
-            elif output_home:
-                lines.append(f"磁盘 (/home): {output_home}")
-            else:
-                lines.append("磁盘 (/home): 不可用")
-        
-        return "\n".join(lines)
-
-
-    def get_load_average(self):
-        """获取系统平均负载。"""
-        # uptime 命令输出中包含负载信息，awk用于提取，sed去除前导空格
-        output, err = self._execute_command("uptime | awk -F'load average:' '{print $2}' | sed 's/^ *//'")
-        if err:
-            return f"平均负载错误: {err}"
-        if output:
-            return f"平均负载: {output}"
-        return "平均负载: 不可用"
-
-    def get_uptime(self):
-        """获取服务器运行时间。"""
-        # uptime -p 提供易读的运行时间格式 (例如 "up 2 days, 3 hours, 4 minutes")
-        output, err = self._execute_command("uptime -p") 
-        if err or not output: # 如果 uptime -p 失败或无输出，尝试备用命令
-             # 备用命令，尝试从标准 uptime 输出中提取运行时间
-             output_s, err_s = self._execute_command("uptime | awk -F'(up | days?,| users?,| load average:)' '{for(i=1;i<=NF;i++) if ($i ~ /min/) {print $i \" minutes\"; break} else if ($i ~ /day/) {print $i \" days, \" $(i+1); break} else if ($i ~ /user/) {print $(i-2) \" \" $(i-1); break} else {print $i}}' | head -n1 | sed 's/^ *//; s/, *$/ /'")
-             if err_s:
-                 return f"运行时间错误: {err_s}"
-             if output_s: # 检查备用命令是否有输出
-                 return f"运行时间: {output_s.strip()}"
-        if output: # 如果 uptime -p 成功
-            return f"{output.replace('up ', '运行时间: ')}"
-        return "运行时间: 不可用"
-
-    def get_pod_info(self, namespace, pod_name_filter):
-        """获取指定命名空间中Pod的信息，包括节点名称和节点IP，并显示所有镜像。"""
-        if not self.client:
-            return "未连接到服务器。"
-        
-        command = f"kubectl get pods -n {namespace} -o json"
-        # print(f"DEBUG: Executing Kubernetes command: '{command}' with pod_name_filter: '{pod_name_filter}'")
-        output, err = self._execute_command(command)
-
-        if err:
-            if "command not found" in err.lower() or "not found" in err.lower() or "不存在" in err:
-                 return f"获取Pod信息错误: {err}. 请确保 kubectl 已在服务器上安装并配置在PATH中。"
-            return f"获取Pod信息错误: {err}"
-        if not output:
-            check_ns_cmd = f"kubectl get ns {namespace} --no-headers"
-            ns_out, ns_err = self._execute_command(check_ns_cmd)
-            if ns_err or not ns_out:
-                return f"无法确认命名空间 '{namespace}' 是否存在，或kubectl没有输出。"
-            return f"在命名空间 '{namespace}' 中未找到Pod，或者kubectl没有输出。"
+                             QTabWidget, QTableWidget, QTableWidgetItem,
+                             QHeaderView, QSpinBox, QFileDialog, QCheckBox) # 确保 QTabWidget 也已导入
+from PyQt6.QtCore import QThread, QTimer, pyqtSignal
+from PyQt6.QtGui import QFontDatabase
+from server_resource_core import (ServerResourceMonitor, RemoteAgent, PodIndex, MetricHistory,
+                                  AlertEngine, ssh_pool, poll_host, load_inventory,
+                                  format_snapshot, format_metric_lines, fleet_cells)
 
-        try:
-            pod_data = json.loads(output)
-            
-            pods_to_process = []
-            node_names = set() 
-
-            items = pod_data.get("items")
-            if items is None and not pod_data: 
-                 return f"命名空间 '{namespace}' 可能不存在或您没有权限访问。"
-            if not isinstance(items, list): 
-                 return f"获取Pod信息时返回了意外的数据结构 (items不是列表)。"
-            if not items: 
-                return f"命名空间 '{namespace}' 中没有Pod。"
-
-            for item in items:
-                pod_name = item.get("metadata", {}).get("name", "N/A")
-                
-                # Pod 名称筛选 (如果提供了过滤器)
-                if pod_name_filter and (pod_name_filter.lower() not in pod_name.lower()):
-                    continue
-
-                status = item.get("status", {}).get("phase", "N/A")
-                node_name = item.get("spec", {}).get("nodeName", "N/A")
-                if node_name != "N/A":
-                    node_names.add(node_name)
-
-                all_images = []
-                for container in item.get("spec", {}).get("containers", []): 
-                    all_images.append(container.get("image", ""))
-                for init_container in item.get("spec", {}).get("initContainers", []): 
-                    all_images.append(init_container.get("image", ""))
-                
-                # 不需要再特别筛选java_images，直接将收集到的信息加入
-                pods_to_process.append({
-                    "name": pod_name,
-                    "status": status,
-                    "node_name": node_name,
-                    "images": all_images, # 保留所有镜像信息
-                })
-
-            if not pods_to_process: # 如果经过名称过滤后没有Pod了
-                if pod_name_filter:
-                    return f"在命名空间 '{namespace}' 中，名称包含 '{pod_name_filter}' 的Pod未找到。"
-                else: # 如果没有名称过滤器，但列表仍为空，说明命名空间本身可能就没有Pod
-                    return f"在命名空间 '{namespace}' 中未找到任何Pod。"
-
-
-            node_ip_map = {}
-            if node_names: 
-                # print(f"DEBUG: Fetching IP info for nodes: {list(node_names)}")
-                for n_name in node_names:
-                    node_command = f"kubectl get node {n_name} -o json"
-                    # print(f"DEBUG: Executing node command: '{node_command}'")
-                    node_output, node_err = self._execute_command(node_command)
-                    if node_err:
-                        print(f"警告: 获取节点 '{n_name}' 信息失败: {node_err}")
-                        node_ip_map[n_name] = "IP获取失败"
-                        continue
-                    if not node_output:
-                        print(f"警告: 节点 '{n_name}' 未返回信息。")
-                        node_ip_map[n_name] = "IP信息为空"
-                        continue
-                    
-                    try:
-                        node_json = json.loads(node_output)
-                        ip_address = "N/A"
-                        for addr in node_json.get("status", {}).get("addresses", []):
-                            if addr.get("type") == "InternalIP":
-                                ip_address = addr.get("address", "N/A")
-                                break
-                        if ip_address == "N/A": 
-                             for addr in node_json.get("status", {}).get("addresses", []):
-                                if addr.get("type") == "ExternalIP":
-                                    ip_address = addr.get("address", "N/A")
-                                    break
-                        node_ip_map[n_name] = ip_address
-                    except json.JSONDecodeError:
-                        print(f"警告: 解析节点 '{n_name}' JSON失败。")
-                        node_ip_map[n_name] = "IP解析失败"
-                    except Exception as e_node:
-                        print(f"警告: 处理节点 '{n_name}' 信息时发生错误: {str(e_node)}")
-                        node_ip_map[n_name] = "IP处理错误"
-
-            pod_details = []
-            for pod_info in pods_to_process:
-                node_ip = node_ip_map.get(pod_info["node_name"], "IP未知") if pod_info["node_name"] != "N/A" else "N/A"
-                # 显示所有镜像
-                images_str = ", ".join(pod_info['images']) if pod_info['images'] else "无" # 使用 'images' 键
-                detail = (f"Pod: {pod_info['name']}\n"
-                          f"  状态: {pod_info['status']}\n"
-                          f"  镜像: {images_str}\n"  # 修改这里以显示所有镜像
-                          f"  节点: {pod_info['node_name']}\n"
-                          f"  节点IP: {node_ip}")
-                pod_details.append(detail)
-            
-            if not pod_details: 
-                 return f"在命名空间 '{namespace}' 中未找到符合条件的Pod（内部逻辑问题）。" 
-                 
-            return "\n---\n".join(pod_details)
-
-        except json.JSONDecodeError:
-            return f"解析Pod列表JSON失败 (非JSON输出): {output[:200]}... 请确保kubectl已正确配置并有权限。"
-        except Exception as e: 
-            import traceback 
-            print(f"DEBUG: Unexpected error in get_pod_info: {str(e)}")
-            print(f"DEBUG: Traceback: {traceback.format_exc()}")
-            return f"处理Pod信息时发生意外错误: {str(e)}"
-
-    def get_all_resources(self):
-        """获取所有资源信息。"""
-        if not self.client:
-            return "未连接。请先连接服务器。"
-
-        resources = [
-            f"服务器: {self.hostname}:{self.port}",
-            "---------------------------------",
-            self.get_uptime(),
-            self.get_cpu_usage(),
-            self.get_memory_usage(),
-            self.get_disk_usage(),
-            self.get_load_average(),
-            "---------------------------------"
-        ]
-        return "\n".join(resources)
+# 批量监控表格的列，后5列与 fleet_cells / format_metric_lines 的返回顺序一致
+FLEET_COLUMNS = ["名称", "主机", "状态", "运行时间", "CPU", "内存", "磁盘", "平均负载"]
 
-    def close(self):
-        """关闭SSH连接。"""
-        if self.client:
-            self.client.close()
-            self.client = None
-            print("连接已关闭。")
+# Pod实时监视表格的列
+POD_COLUMNS = ["Pod", "状态", "镜像", "节点", "节点IP"]
 
 
 class MonitorThread(QThread):
     """运行资源监控的线程，以防止UI冻结。"""
-    finished = pyqtSignal(str)  # 用于发射结果或错误的信号
+    finished = pyqtSignal(str)  # 用于发射结果或错误的信号，每次任务只发射一次
+    status = pyqtSignal(str)  # 任务进行中的提示信息
+    sample_ready = pyqtSignal(str, object)  # "主机:端口", 本次采集的 ResourceSnapshot
 
-    def __init__(self, monitor_instance, action, namespace=None, pod_name_filter=None):
+    def __init__(self, monitor_instance, action, namespace=None, pod_name_filter=None, top_n=0):
         super().__init__()
         self.monitor = monitor_instance # ServerResourceMonitor 的实例
         self.action = action 
         self.namespace = namespace
         self.pod_name_filter = pod_name_filter
+        self.top_n = top_n # 进程Top N，0表示不采集进程
+
+    def cancel(self):
+        """取消正在执行的远程命令，线程随后以“命令已取消”结束。"""
+        self.monitor.cancel()
 
     def run(self):
         """线程的主要逻辑。"""
@@ -324,11 +47,13 @@ class MonitorThread(QThread):
             return
 
         # 发射正在获取数据的消息，给用户即时反馈
-        self.finished.emit(f"已连接到 {self.monitor.hostname}。正在获取资源数据...") 
+        self.status.emit(f"已连接到 {self.monitor.hostname}。正在获取资源数据...")
         
         result_data = ""
         if self.action == "get_resources":
-            result_data = self.monitor.get_all_resources()
+            snapshot = self.monitor.get_resource_snapshot(top_n=self.top_n)
+            result_data = format_snapshot(snapshot)
+            self.sample_ready.emit(f"{self.monitor.hostname}:{self.monitor.port}", snapshot)
         elif self.action == "get_pod_info":
             if not self.namespace: # Namespace是必填的
                 self.finished.emit("错误: 请提供Kubernetes命名空间。")
@@ -343,6 +68,125 @@ class MonitorThread(QThread):
         self.finished.emit(result_data) # 发射最终的资源数据
 
 
+class PodWatchThread(QThread):
+    """在后台消费Pod的watch事件流，只把发生变化的Pod发射给界面。"""
+    pod_changed = pyqtSignal(str, str, dict)  # "upsert"/"delete", Pod名称, 记录（含节点IP）
+    stopped = pyqtSignal(str)  # 停止原因或错误信息
+
+    def __init__(self, monitor_instance, namespace, pod_name_filter=""):
+        super().__init__()
+        self.monitor = monitor_instance
+        self.namespace = namespace
+        self.index = PodIndex(pod_name_filter)
+        self.stop_event = threading.Event()
+        self.node_ip_map = {}
+        self._refreshed_nodes = set() # 已尝试强制刷新过的未知节点，避免重复查询
+
+    def stop(self):
+        """请求停止监视。"""
+        self.stop_event.set()
+
+    def _resolve_node_ip(self, node_name):
+        """查询节点IP，未知节点最多强制刷新一次节点映射。"""
+        if node_name == "N/A":
+            return "N/A"
+        if node_name not in self.node_ip_map and node_name not in self._refreshed_nodes:
+            self._refreshed_nodes.add(node_name)
+            node_ip_map, err = self.monitor.get_node_ip_map(force_refresh=bool(self.node_ip_map))
+            if not err:
+                self.node_ip_map = node_ip_map
+        return self.node_ip_map.get(node_name, "IP未知")
+
+    def _emit_change(self, action, name, record):
+        record = dict(record, node_ip=self._resolve_node_ip(record["node_name"]))
+        self.pod_changed.emit(action, name, record)
+
+    def _on_event(self, event_type, pod_object):
+        change = self.index.apply_event(event_type, pod_object)
+        if change is not None:
+            self._emit_change(*change)
+
+    def _on_list(self, pod_objects):
+        # 首次及每次重新建立监视时重建索引，监视中断期间删除的Pod在这里发出 delete
+        for change in self.index.reset(pod_objects):
+            self._emit_change(*change)
+
+    def run(self):
+        """线程的主要逻辑。"""
+        connected, msg = self.monitor.connect()
+        if not connected:
+            self.stopped.emit(msg)
+            return
+        err = self.monitor.watch_pods(self.namespace, self._on_event, self.stop_event, on_list=self._on_list)
+        self.monitor.close()
+        self.stopped.emit(f"监视异常结束: {err}" if err else "实时监视已停止。")
+
+
+class AgentMonitorThread(QThread):
+    """代理模式：启动远程采集代理，把它持续推送的快照转发给界面。"""
+    sample_ready = pyqtSignal(str, object)  # "主机:端口", ResourceSnapshot
+    stopped = pyqtSignal(str)  # 停止原因或错误信息
+
+    def __init__(self, monitor_instance, interval):
+        super().__init__()
+        self.monitor = monitor_instance
+        self.interval = interval
+        self.stop_event = threading.Event()
+
+    def stop(self):
+        """请求停止代理。"""
+        self.stop_event.set()
+
+    def run(self):
+        """线程的主要逻辑。"""
+        connected, msg = self.monitor.connect()
+        if not connected:
+            self.stopped.emit(msg)
+            return
+        agent = RemoteAgent(self.monitor, self.interval)
+        started, msg = agent.start()
+        if started:
+            host = f"{self.monitor.hostname}:{self.monitor.port}"
+            try:
+                for snapshot in agent.snapshots(self.stop_event):
+                    self.sample_ready.emit(host, snapshot)
+                msg = "采集代理已停止。" if self.stop_event.is_set() else "采集代理意外退出。"
+            except Exception as e:
+                msg = f"读取采集代理输出失败: {str(e)}"
+            finally:
+                agent.stop()
+        self.monitor.close()
+        self.stopped.emit(msg)
+
+
+class FleetMonitorThread(QThread):
+    """使用有界线程池并发采集多台主机的资源信息，每台主机完成后立即发射结果。"""
+    host_finished = pyqtSignal(int, bool, object)  # 行号, 是否成功, ResourceSnapshot 或错误信息
+    all_finished = pyqtSignal(int, int)  # 成功数, 总数
+
+    def __init__(self, hosts, max_workers=8, pool=None):
+        super().__init__()
+        self.hosts = hosts
+        self.max_workers = max_workers
+        self.pool = pool
+
+    def run(self):
+        """线程的主要逻辑。"""
+        succeeded = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(poll_host, host, self.pool): row for row, host in enumerate(self.hosts)}
+            for future in as_completed(futures):
+                row = futures[future]
+                try:
+                    success, result = future.result()
+                except Exception as e:
+                    success, result = False, f"采集失败: {str(e)}"
+                if success:
+                    succeeded += 1
+                self.host_finished.emit(row, success, result)
+        self.all_finished.emit(succeeded, len(self.hosts))
+
+
 class ServerMonitorGUI(QMainWindow):
     """服务器资源监视器的主GUI窗口。"""
     def __init__(self):
@@ -351,6 +195,15 @@ class ServerMonitorGUI(QMainWindow):
         self.setMinimumSize(600, 600) # 调整窗口大小以适应新UI元素
 
         self.monitor_thread = None # 用于管理监控线程
+        self.fleet_thread = None # 用于管理批量监控线程
+        self.fleet_hosts = [] # 当前批量监控表格中各行对应的主机
+        self.fleet_snapshots = {} # 批量监控结果 {行号: ResourceSnapshot}
+        self.pod_watch_thread = None # 用于管理Pod实时监视线程
+        self.pod_rows = {} # 实时监视表格中 {Pod名称: 行号}
+        self.metric_history = MetricHistory() # 各主机的指标历史（定长环形缓冲区）
+        self.agent_thread = None # 代理模式下的采集线程
+        self.alert_engine = AlertEngine() # 基于每次采样增量判断的阈值告警
+        self.pod_watch_host = None # 实时监视Pod所在的 "主机:端口"
         self.current_action_button = None # 用于跟踪当前哪个按钮触发了操作
 
         # 预设服务器信息
@@ -382,6 +235,36 @@ class ServerMonitorGUI(QMainWindow):
         self.fetch_resources_button = QPushButton("获取服务器资源")
         self.fetch_resources_button.clicked.connect(self.start_fetch_resources)
         resource_tab_layout.addWidget(self.fetch_resources_button)
+
+        auto_refresh_layout = QHBoxLayout()
+        self.auto_refresh_checkbox = QCheckBox("自动刷新")
+        self.auto_refresh_checkbox.toggled.connect(self.on_auto_refresh_toggled)
+        auto_refresh_layout.addWidget(self.auto_refresh_checkbox)
+        auto_refresh_layout.addWidget(QLabel("间隔(秒):"))
+        self.auto_refresh_interval_spin = QSpinBox()
+        self.auto_refresh_interval_spin.setRange(1, 3600)
+        self.auto_refresh_interval_spin.setValue(10)
+        auto_refresh_layout.addWidget(self.auto_refresh_interval_spin)
+        self.agent_mode_checkbox = QCheckBox("代理模式")
+        self.agent_mode_checkbox.setToolTip("推送轻量采集代理到服务器，由代理在一个长连接上持续推送指标")
+        auto_refresh_layout.addWidget(self.agent_mode_checkbox)
+        auto_refresh_layout.addWidget(QLabel("进程Top N:"))
+        self.top_processes_spin = QSpinBox()
+        self.top_processes_spin.setRange(0, 50)
+        self.top_processes_spin.setValue(5)
+        self.top_processes_spin.setToolTip("同时列出CPU和内存占用最高的N个进程，0表示不采集（代理模式不支持）")
+        auto_refresh_layout.addWidget(self.top_processes_spin)
+        resource_tab_layout.addLayout(auto_refresh_layout)
+
+        # 历史趋势（迷你图），数据来自定长环形缓冲区
+        self.trend_display = QTextEdit()
+        self.trend_display.setReadOnly(True)
+        self.trend_display.setFont(QFontDatabase.systemFont(QFontDatabase.SystemFont.FixedFont))
+        self.trend_display.setPlaceholderText("开启自动刷新后，这里显示各项指标的历史趋势。")
+        resource_tab_layout.addWidget(self.trend_display)
+
+        self.auto_refresh_timer = QTimer(self)
+        self.auto_refresh_timer.timeout.connect(self.on_auto_refresh_tick)
         self.action_tabs.addTab(resource_tab, "服务器资源")
 
         # Tab 2: Kubernetes Pod Info
@@ -402,13 +285,47 @@ class ServerMonitorGUI(QMainWindow):
         pod_filter_layout.addWidget(self.pod_name_filter_input)
         pod_tab_layout.addLayout(pod_filter_layout)
 
+        pod_buttons_layout = QHBoxLayout()
         self.fetch_pod_info_button = QPushButton("获取Pod信息")
         self.fetch_pod_info_button.clicked.connect(self.start_fetch_pod_info)
-        pod_tab_layout.addWidget(self.fetch_pod_info_button)
+        pod_buttons_layout.addWidget(self.fetch_pod_info_button)
+        self.watch_pods_button = QPushButton("开始实时监视")
+        self.watch_pods_button.clicked.connect(self.toggle_pod_watch)
+        pod_buttons_layout.addWidget(self.watch_pods_button)
+        pod_tab_layout.addLayout(pod_buttons_layout)
+
+        # 实时监视模式下的Pod表格，只重绘发生变化的行
+        self.pod_table = QTableWidget(0, len(POD_COLUMNS))
+        self.pod_table.setHorizontalHeaderLabels(POD_COLUMNS)
+        self.pod_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.pod_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        pod_tab_layout.addWidget(self.pod_table)
         self.action_tabs.addTab(pod_tab, "K8s Pod信息")
+
+        # Tab 3: Fleet Monitoring
+        fleet_tab = QWidget()
+        self._create_fleet_tab(QVBoxLayout(fleet_tab))
+        self.action_tabs.addTab(fleet_tab, "批量监控")
+
+        # Tab 4: Alerts
+        alert_tab = QWidget()
+        alert_tab_layout = QVBoxLayout(alert_tab)
+        alert_tab_layout.addWidget(QLabel("规则: " + "；".join(
+            f"{rule.name}" + (f"（连续{rule.for_samples}次）" if rule.for_samples > 1 else "")
+            for rule in self.alert_engine.rules)))
+        self.alert_log = QTextEdit()
+        self.alert_log.setReadOnly(True)
+        self.alert_log.setPlaceholderText("自动刷新、批量监控和Pod实时监视的结果会按规则检查，告警与恢复记录显示在这里。")
+        alert_tab_layout.addWidget(self.alert_log)
+        self.action_tabs.addTab(alert_tab, "告警")
         
         results_group = QGroupBox("结果信息")
         results_layout = QVBoxLayout()
+        self.cancel_task_button = QPushButton("取消当前任务")
+        self.cancel_task_button.setToolTip("中止正在执行的远程命令（如卡住的 kubectl 或 df）")
+        self.cancel_task_button.setEnabled(False)
+        self.cancel_task_button.clicked.connect(self.cancel_monitor_task)
+        results_layout.addWidget(self.cancel_task_button)
         self.results_display = QTextEdit()
         self.results_display.setReadOnly(True) # 设置为只读
         results_layout.addWidget(self.results_display)
@@ -418,6 +335,179 @@ class ServerMonitorGUI(QMainWindow):
         # 状态栏
         self.statusBar().showMessage("就绪。请输入服务器详细信息并选择操作。")
 
+        # 定期回收连接池中的空闲和已失效连接；健康探测可能阻塞，在后台线程中执行，不占用界面线程
+        self.pool_evict_timer = QTimer(self)
+        self.pool_evict_timer.timeout.connect(
+            lambda: threading.Thread(target=ssh_pool.evict_idle, daemon=True).start())
+        self.pool_evict_timer.start(60 * 1000)
+
+    def _create_fleet_tab(self, fleet_layout):
+        """创建批量监控页：并发采集所有预设或清单文件中的主机，结果逐行显示在表格中。"""
+        fleet_controls = QHBoxLayout()
+        fleet_controls.addWidget(QLabel("并发数:"))
+        self.fleet_workers_spin = QSpinBox()
+        self.fleet_workers_spin.setRange(1, 64)
+        self.fleet_workers_spin.setValue(8)
+        fleet_controls.addWidget(self.fleet_workers_spin)
+        self.fleet_presets_button = QPushButton("批量获取所有预设")
+        self.fleet_presets_button.clicked.connect(self.start_fleet_presets)
+        fleet_controls.addWidget(self.fleet_presets_button)
+        self.fleet_inventory_button = QPushButton("导入清单并批量获取")
+        self.fleet_inventory_button.clicked.connect(self.start_fleet_inventory)
+        fleet_controls.addWidget(self.fleet_inventory_button)
+        fleet_layout.addLayout(fleet_controls)
+
+        self.fleet_table = QTableWidget(0, len(FLEET_COLUMNS))
+        self.fleet_table.setHorizontalHeaderLabels(FLEET_COLUMNS)
+        self.fleet_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.fleet_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        fleet_layout.addWidget(self.fleet_table)
+
+    def start_fleet_presets(self):
+        """处理"批量获取所有预设"按钮点击事件。"""
+        hosts = [{
+            "name": preset["name"],
+            "hostname": preset["hostname"],
+            "port": int(preset["port"]),
+            "username": preset["username"],
+            "password": preset["password"],
+        } for preset in self.presets[1:]] # 第一个项目是提示信息，跳过
+        self._start_fleet_task(hosts)
+
+    def start_fleet_inventory(self):
+        """处理"导入清单并批量获取"按钮点击事件。"""
+        path, _ = QFileDialog.getOpenFileName(self, "选择主机清单", "", "JSON Files (*.json);;All Files (*)")
+        if not path:
+            return
+        try:
+            hosts = load_inventory(path)
+        except (OSError, ValueError) as e: # json.JSONDecodeError 是 ValueError 的子类
+            QMessageBox.warning(self, "清单错误", f"无法加载主机清单: {str(e)}")
+            return
+        self._start_fleet_task(hosts)
+
+    def _start_fleet_task(self, hosts):
+        """初始化批量监控表格并启动批量监控线程。"""
+        if not hosts:
+            QMessageBox.warning(self, "输入错误", "没有可监控的主机。")
+            return
+        if self.fleet_thread and self.fleet_thread.isRunning():
+            QMessageBox.information(self, "繁忙", "批量监控正在进行中，请稍候。")
+            return
+
+        self.fleet_hosts = hosts
+        self.fleet_snapshots = {}
+        self.fleet_table.setRowCount(len(hosts))
+        for row, host in enumerate(hosts):
+            self.fleet_table.setItem(row, 0, QTableWidgetItem(host["name"]))
+            self.fleet_table.setItem(row, 1, QTableWidgetItem(f"{host['hostname']}:{host['port']}"))
+            self.fleet_table.setItem(row, 2, QTableWidgetItem("采集中..."))
+            for column in range(3, len(FLEET_COLUMNS)):
+                self.fleet_table.setItem(row, column, QTableWidgetItem(""))
+
+        self.fleet_presets_button.setEnabled(False)
+        self.fleet_inventory_button.setEnabled(False)
+        self.statusBar().showMessage(f"正在并发采集 {len(hosts)} 台主机...")
+
+        self.fleet_thread = FleetMonitorThread(hosts, self.fleet_workers_spin.value(), ssh_pool)
+        self.fleet_thread.host_finished.connect(self.on_fleet_host_finished)
+        self.fleet_thread.all_finished.connect(self.on_fleet_finished)
+        self.fleet_thread.start()
+
+    def on_fleet_host_finished(self, row, success, result):
+        """单台主机采集完成时更新表格中对应的一行。"""
+        self.fleet_table.setItem(row, 2, QTableWidgetItem("正常" if success else "失败"))
+        if not success:
+            item = QTableWidgetItem(result)
+            item.setToolTip(result)
+            self.fleet_table.setItem(row, 3, item)
+            return
+        self.fleet_snapshots[row] = result
+        self._handle_alert_events(self.alert_engine.evaluate(f"{result.hostname}:{result.port}",
+                                                             result.metric_values(), result.timestamp))
+        for offset, (cell_text, tooltip) in enumerate(zip(fleet_cells(result), format_metric_lines(result))):
+            item = QTableWidgetItem(cell_text)
+            item.setToolTip(tooltip)
+            self.fleet_table.setItem(row, 3 + offset, item)
+        self.fleet_table.resizeRowToContents(row)
+
+    def on_fleet_finished(self, succeeded, total):
+        """批量监控线程完成时的槽函数。"""
+        self.fleet_presets_button.setEnabled(True)
+        self.fleet_inventory_button.setEnabled(True)
+        self.statusBar().showMessage(f"批量监控完成：{succeeded}/{total} 台主机采集成功。")
+
+    def toggle_pod_watch(self):
+        """处理"开始/停止实时监视"按钮点击事件。"""
+        if self.pod_watch_thread and self.pod_watch_thread.isRunning():
+            self.pod_watch_thread.stop()
+            self.watch_pods_button.setEnabled(False) # 等待线程退出后再恢复
+            self.statusBar().showMessage("正在停止实时监视...")
+            return
+
+        common_inputs = self._validate_common_inputs()
+        if not common_inputs:
+            return
+        namespace = self.namespace_input.text().strip()
+        if not namespace:
+            QMessageBox.warning(self, "输入错误", "Kubernetes命名空间是必填项。")
+            return
+        hostname, port, username, password = common_inputs
+
+        self.pod_table.setRowCount(0)
+        self.pod_rows = {}
+        self.pod_watch_host = f"{hostname}:{port}"
+        monitor = ServerResourceMonitor(hostname, username, password, port, pool=ssh_pool)
+        self.pod_watch_thread = PodWatchThread(monitor, namespace, self.pod_name_filter_input.text().strip())
+        self.pod_watch_thread.pod_changed.connect(self.on_pod_changed)
+        self.pod_watch_thread.stopped.connect(self.on_pod_watch_stopped)
+        self.pod_watch_thread.start()
+        self.watch_pods_button.setText("停止实时监视")
+        self.statusBar().showMessage(f"正在实时监视命名空间 {namespace} ...")
+
+    def on_pod_changed(self, action, name, record):
+        """watch事件到达时只更新对应的一行，并检查该Pod的状态告警。"""
+        phase = None if action == "delete" else record["status"]
+        self._handle_alert_events(self.alert_engine.evaluate(self.pod_watch_host, {f"pod_phase:{name}": phase}))
+        row = self.pod_rows.get(name)
+        if action == "delete":
+            if row is None:
+                return
+            self.pod_table.removeRow(row)
+            del self.pod_rows[name]
+            for pod_name, pod_row in self.pod_rows.items(): # 被删除行之后的行号前移
+                if pod_row > row:
+                    self.pod_rows[pod_name] = pod_row - 1
+            return
+        if row is None:
+            row = self.pod_table.rowCount()
+            self.pod_table.insertRow(row)
+            self.pod_rows[name] = row
+        values = [record["name"], record["status"], ", ".join(record["images"]) or "无",
+                  record["node_name"], record["node_ip"]]
+        for column, text in enumerate(values):
+            self.pod_table.setItem(row, column, QTableWidgetItem(text))
+
+    def on_pod_watch_stopped(self, message):
+        """实时监视线程结束时的槽函数。"""
+        self.watch_pods_button.setText("开始实时监视")
+        self.watch_pods_button.setEnabled(True)
+        self.statusBar().showMessage(message)
+
+    def closeEvent(self, event):
+        """窗口关闭时取消进行中的任务，停止实时监视和采集代理，并断开连接池中的所有连接。"""
+        if self.monitor_thread and self.monitor_thread.isRunning():
+            self.monitor_thread.cancel()
+            self.monitor_thread.wait(3000)
+        if self.pod_watch_thread and self.pod_watch_thread.isRunning():
+            self.pod_watch_thread.stop()
+            self.pod_watch_thread.wait(3000)
+        if self.agent_thread and self.agent_thread.isRunning():
+            self.agent_thread.stop()
+            self.agent_thread.wait(3000)
+        ssh_pool.close_all()
+        super().closeEvent(event)
+
     def _create_server_inputs(self, server_layout):
         """创建服务器连接相关的输入字段。"""
         # 预设服务器选择
@@ -513,7 +603,7 @@ class ServerMonitorGUI(QMainWindow):
         self.current_action_button = button_to_disable # 记录当前操作按钮
         self.statusBar().showMessage(f"尝试连接到 {hostname}...")
 
-        monitor = ServerResourceMonitor(hostname, username, password, port)
+        monitor = ServerResourceMonitor(hostname, username, password, port, pool=ssh_pool)
         
         thread_args = {
             "monitor_instance": monitor,
@@ -523,13 +613,28 @@ class ServerMonitorGUI(QMainWindow):
 
         self.monitor_thread = MonitorThread(**thread_args)
         self.monitor_thread.finished.connect(self.on_fetch_completed)
+        self.monitor_thread.status.connect(self.on_task_status)
+        self.monitor_thread.sample_ready.connect(self.on_sample_ready)
         self.monitor_thread.start()
+        self.cancel_task_button.setEnabled(True)
+
+    def cancel_monitor_task(self):
+        """处理"取消当前任务"按钮点击事件：关闭正在执行的命令通道，线程随后以“命令已取消”结束。"""
+        if self.monitor_thread and self.monitor_thread.isRunning():
+            self.monitor_thread.cancel()
+            self.cancel_task_button.setEnabled(False)
+            self.statusBar().showMessage("正在取消任务...")
+
+    def on_task_status(self, message):
+        """显示任务进行中的提示信息。"""
+        self.results_display.setText(message)
+        self.statusBar().showMessage(message)
 
     def start_fetch_resources(self):
         """处理"获取服务器资源"按钮点击事件。"""
         self._start_monitor_task(
             action="get_resources",
-            monitor_args={},
+            monitor_args={"top_n": self.top_processes_spin.value()},
             button_to_disable=self.fetch_resources_button
         )
 
@@ -549,12 +654,82 @@ class ServerMonitorGUI(QMainWindow):
             button_to_disable=self.fetch_pod_info_button
         )
 
+    def on_auto_refresh_toggled(self, checked):
+        """开启或关闭自动刷新。代理模式下改为启动远程采集代理，由代理按间隔推送。"""
+        if not checked:
+            self.auto_refresh_timer.stop()
+            if self.agent_thread and self.agent_thread.isRunning():
+                self.agent_thread.stop()
+            self.agent_mode_checkbox.setEnabled(True)
+            return
+        self.agent_mode_checkbox.setEnabled(False) # 运行期间不允许切换模式
+        if self.agent_mode_checkbox.isChecked():
+            self._start_agent()
+        else:
+            self.auto_refresh_timer.start(self.auto_refresh_interval_spin.value() * 1000)
+            self.on_auto_refresh_tick() # 立即刷新一次
+
+    def _start_agent(self):
+        """启动代理模式的采集线程。"""
+        common_inputs = self._validate_common_inputs()
+        if not common_inputs:
+            self.auto_refresh_checkbox.setChecked(False)
+            return
+        if self.agent_thread and self.agent_thread.isRunning():
+            QMessageBox.information(self, "繁忙", "上一个采集代理正在退出，请稍候。")
+            self.auto_refresh_checkbox.setChecked(False)
+            return
+        hostname, port, username, password = common_inputs
+        monitor = ServerResourceMonitor(hostname, username, password, port, pool=ssh_pool)
+        self.agent_thread = AgentMonitorThread(monitor, self.auto_refresh_interval_spin.value())
+        self.agent_thread.sample_ready.connect(self.on_agent_sample)
+        self.agent_thread.stopped.connect(self.on_agent_stopped)
+        self.agent_thread.start()
+        self.statusBar().showMessage(f"正在 {hostname} 上启动采集代理...")
+
+    def on_agent_sample(self, host, snapshot):
+        """代理推送一个快照时刷新结果与趋势。"""
+        self.results_display.setText(format_snapshot(snapshot))
+        self.on_sample_ready(host, snapshot)
+        self.statusBar().showMessage(f"采集代理运行中，最近更新: {time.strftime('%H:%M:%S')}")
+
+    def on_agent_stopped(self, message):
+        """采集代理线程结束时的槽函数。"""
+        self.statusBar().showMessage(message)
+        if self.auto_refresh_checkbox.isChecked() and self.agent_mode_checkbox.isChecked():
+            self.auto_refresh_checkbox.setChecked(False) # 代理异常退出时同步复选框状态
+
+    def on_auto_refresh_tick(self):
+        """自动刷新定时器触发：上一次任务仍在进行时跳过本次。"""
+        if self.monitor_thread and self.monitor_thread.isRunning():
+            return
+        if not self._validate_common_inputs():
+            self.auto_refresh_checkbox.setChecked(False)
+            return
+        self.auto_refresh_timer.setInterval(self.auto_refresh_interval_spin.value() * 1000)
+        self.start_fetch_resources()
+
+    def _handle_alert_events(self, events):
+        """记录告警事件，并在状态栏提示最近一条。"""
+        for event in events:
+            self.alert_log.append(str(event))
+        if events:
+            self.statusBar().showMessage(str(events[-1]))
+
+    def on_sample_ready(self, host, snapshot):
+        """记录一次采样、检查告警规则并刷新当前主机的趋势图。"""
+        values = snapshot.metric_values()
+        self.metric_history.record(host, values)
+        self._handle_alert_events(self.alert_engine.evaluate(host, values, snapshot.timestamp))
+        self.trend_display.setPlainText(f"{host}\n{self.metric_history.render(host)}")
+
     def on_fetch_completed(self, result_text):
         """监控线程完成时的槽函数。"""
         self.results_display.setText(result_text)
         # 重新启用所有操作按钮
         self.fetch_resources_button.setEnabled(True)
         self.fetch_pod_info_button.setEnabled(True)
+        self.cancel_task_button.setEnabled(False)
         self.current_action_button = None # 清除当前操作按钮记录
         
         if "连接失败" in result_text: